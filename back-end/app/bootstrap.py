@@ -0,0 +1,30 @@
+"""
+Schema Bootstrap Command
+=========================
+Creates the database tables and applies the inline schema migrations, then
+exits:
+
+  python -m app.bootstrap
+
+Run it once before starting the API whenever CREATE_TABLES_ON_STARTUP is
+disabled (the default). The Docker image runs it on every start, before
+uvicorn; it is idempotent, so running it against an up-to-date database
+only verifies the schema.
+"""
+
+import asyncio
+
+from app.core.database import get_engine
+from app.main import create_tables_and_migrate
+
+
+async def main() -> None:
+    """Bootstrap the schema and close the connection pool."""
+    try:
+        await create_tables_and_migrate()
+    finally:
+        await get_engine().dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
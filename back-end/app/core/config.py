@@ -3,8 +3,12 @@ Application Configuration
 =========================
 Uses pydantic-settings to load environment variables into a typed Settings object.
 The DATABASE_URL is the most important setting — it tells SQLAlchemy where to connect.
+
+Settings are built lazily through `get_settings()`, which caches a single instance.
 """
 
+from functools import lru_cache
+
 from pydantic_settings import BaseSettings
 
 
@@ -20,6 +24,38 @@ class Settings(BaseSettings):
         "postgresql+asyncpg://bulking_user:bulking_pass@db:5432/bulking_db"
     )
 
+    # Connection pool tuning (see app/core/database.py for the sizing formula)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 10  # seconds to wait for a free connection before erroring
+    DB_POOL_RECYCLE: int = 1800  # seconds before a pooled connection is replaced
+    DB_STATEMENT_CACHE_SIZE: int = 500  # prepared statements kept per connection
+    # Set when DATABASE_URL points at PgBouncer in transaction pooling mode:
+    # disables the app-side pool and prepared statement caching
+    DB_USE_PGBOUNCER: bool = False
+
+    # Run create_all + inline migrations during startup. Enabled for Docker/dev
+    # (docker-compose.yml); production deployments manage the schema separately.
+    CREATE_TABLES_ON_STARTUP: bool = False
+
+    # Front-end origins allowed by CORS. Set as a JSON list in the environment,
+    # e.g. ALLOWED_ORIGINS='["https://app.example.com"]'
+    ALLOWED_ORIGINS: list[str] = [
+        "http://localhost:5173",   # Vite dev server
+        "http://127.0.0.1:5173",
+        "http://localhost:3000",
+    ]
+
+    # Log 1 in N requests on the `app.access` logger (0 disables access logs).
+    # /health and /metrics are never logged.
+    ACCESS_LOG_SAMPLE_RATE: int = 100
+
+    # Seconds GET /diet/current responses and generated Excel/PDF exports stay
+    # cached in each worker (0 disables).
+    # Writes only clear the cache of the worker that served them, so enable it
+    # when running a single worker or when a few seconds of staleness is fine.
+    DIET_CACHE_TTL_SECONDS: int = 0
+
     # Application metadata
     APP_NAME: str = "Bulking Control App"
     APP_VERSION: str = "1.0.0"
@@ -27,5 +63,12 @@ class Settings(BaseSettings):
     model_config = {"env_file": ".env", "extra": "ignore"}
 
 
-# Singleton instance — import this everywhere you need settings
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Return the process-wide Settings instance.
+
+    The .env file is only read on the first call; later calls return the cached
+    object. Tests can call `get_settings.cache_clear()` to pick up new env vars.
+    """
+    return Settings()
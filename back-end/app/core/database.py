@@ -2,35 +2,120 @@
 Async Database Engine & Session Factory
 ========================================
 This module sets up the async SQLAlchemy engine and provides:
-  - `async_engine`: the connection pool to PostgreSQL
-  - `AsyncSessionLocal`: a session factory for creating DB sessions
+  - `get_engine()`: the connection pool to PostgreSQL
+  - `get_sessionmaker()`: a session factory for creating DB sessions
   - `get_db()`: a FastAPI dependency that yields a session per request
+  - `DB`: an annotated alias for `get_db`, used as the route parameter type
+  - `violated_constraint()`: the constraint named by an IntegrityError
+
+The engine and session factory are built on first use from `get_settings()`
+and then cached, like the settings themselves. Tests that change settings
+call `get_settings.cache_clear()`, `get_engine.cache_clear()` and
+`get_sessionmaker.cache_clear()` before the app touches the database.
 
 All database operations in this project use async/await for non-blocking I/O.
+
+Pool sizing:
+  Every uvicorn worker process owns its own pool, so the worst-case number of
+  Postgres backends opened by the app is:
+
+      workers × (DB_POOL_SIZE + DB_MAX_OVERFLOW) ≤ max_connections − reserved
+
+  where `reserved` covers superuser slots, migrations, psql sessions and any
+  other service sharing the database. With Postgres' default
+  max_connections=100 and the defaults below (10 + 10), four workers use at
+  most 80 connections. When a request cannot get a connection within
+  DB_POOL_TIMEOUT seconds it fails fast instead of queueing indefinitely.
+
+  Each request holds a single connection: even GET /dashboard/stats runs its
+  queries in turn on the request session (see app/routers/dashboard.py).
+
+PgBouncer:
+  Behind PgBouncer in transaction pooling mode (DB_USE_PGBOUNCER=true) the
+  app keeps no pool of its own (NullPool): PgBouncer multiplexes many client
+  connections over few server backends, so the formula above no longer
+  bounds Postgres connections. The trade-off is that every session opens a
+  fresh connection to PgBouncer, and prepared statements cannot be reused
+  across transactions, so asyncpg's statement cache is disabled and each
+  statement is prepared under a unique name. Prefer the built-in pool when
+  the worker count fits within max_connections.
 """
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from functools import lru_cache
+from typing import Annotated, AsyncGenerator
+from uuid import uuid4
+
+from fastapi import Depends
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import NullPool
+
+from app.core.config import get_settings
+
+
+@lru_cache(maxsize=1)
+def get_engine() -> AsyncEngine:
+    """Create the process-wide async engine from the current settings."""
+    settings = get_settings()
+
+    connect_args = {
+        "server_settings": {"application_name": "bulking_app"},
+        "timeout": 10,     # Seconds to wait for a new connection to be established
+    }
 
-from app.core.config import settings
+    if settings.DB_USE_PGBOUNCER:
+        # PgBouncer pools the connections (see the module docstring)
+        pool_args = {"poolclass": NullPool}
+        connect_args.update(
+            statement_cache_size=0,  # asyncpg's own prepared statement cache
+            prepared_statement_cache_size=0,  # SQLAlchemy's asyncpg adapter cache
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid4()}__",
+        )
+    else:
+        pool_args = {
+            "pool_size": settings.DB_POOL_SIZE,        # Maximum number of persistent connections in the pool
+            "max_overflow": settings.DB_MAX_OVERFLOW,  # Extra connections allowed beyond pool_size under load
+            "pool_timeout": settings.DB_POOL_TIMEOUT,  # Seconds to wait for a free connection
+            "pool_recycle": settings.DB_POOL_RECYCLE,  # Replace connections before Postgres/NAT drops them
+            "pool_use_lifo": True,   # Reuse the most recent connection so idle ones can be trimmed
+            "pool_pre_ping": True,   # Detect stale sockets on checkout instead of failing the request
+        }
+        # Statements are prepared once per pooled connection and reused by text.
+        # Eager loads render one statement per IN-list length, so the cache is
+        # sized well above the number of distinct queries in the app.
+        connect_args["prepared_statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
 
-# Create the async engine.
-# `echo=False` suppresses SQL logging in production. Set to True for debugging.
-async_engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=False,
-    pool_size=20,          # Maximum number of persistent connections in the pool
-    max_overflow=10,       # Extra connections allowed beyond pool_size under load
-)
+    # `echo=False` suppresses SQL logging in production. Set to True for debugging.
+    return create_async_engine(
+        settings.DATABASE_URL,
+        echo=False,
+        connect_args=connect_args,
+        **pool_args,
+    )
 
-# Session factory — each call to AsyncSessionLocal() creates a new session.
-# expire_on_commit=False prevents attributes from being expired after commit,
-# which avoids extra lazy-load queries in async context.
-AsyncSessionLocal = async_sessionmaker(
-    bind=async_engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-)
+
+@lru_cache(maxsize=1)
+def get_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    """
+    Session factory bound to `get_engine()` — each call of the returned
+    factory creates a new session.
+
+    expire_on_commit=False prevents attributes from being expired after commit,
+    which avoids extra lazy-load queries in async context. Together with the
+    INSERT ... RETURNING that SQLAlchemy 2.0 emits on PostgreSQL (server
+    defaults such as created_at included), new rows are complete after
+    commit and never need a `refresh()`.
+    autoflush=False skips the pending-changes check before every query. Writes
+    are always explicit: commit() flushes, and code that needs generated IDs
+    (or must query rows it just added) calls `await db.flush()` first.
+    """
+    return async_sessionmaker(
+        bind=get_engine(),
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autoflush=False,
+    )
 
 
 class Base(DeclarativeBase):
@@ -41,20 +126,33 @@ class Base(DeclarativeBase):
     pass
 
 
-async def get_db():
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
     FastAPI dependency that provides a database session.
     
     Usage in a route:
         @router.get("/example")
-        async def example(db: AsyncSession = Depends(get_db)):
+        async def example(db: DB):
             ...
     
     The session is automatically closed when the request is done,
-    even if an exception occurs (thanks to the finally block).
+    even if an exception occurs (the `async with` block handles it).
+    """
+    async with get_sessionmaker()() as session:
+        yield session
+
+
+# Annotated dependency alias — every route declares `db: DB`, so FastAPI
+# resolves the same dependency definition everywhere.
+DB = Annotated[AsyncSession, Depends(get_db)]
+
+
+def violated_constraint(exc: IntegrityError) -> str | None:
+    """
+    Name of the constraint that rejected a statement, if the driver reports it.
+
+    asyncpg exposes it on the driver exception wrapped by SQLAlchemy, which
+    lets routers map one specific constraint to an HTTP error and re-raise
+    anything else.
     """
-    async with AsyncSessionLocal() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
+    return getattr(exc.orig.__cause__, "constraint_name", None)
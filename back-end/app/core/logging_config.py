@@ -0,0 +1,128 @@
+"""
+Logging Configuration
+======================
+Sets up structured (JSON lines) logging for the whole application.
+
+Each record is emitted as a single JSON object, e.g.:
+  {"ts": "2025-01-01T12:00:00.123Z", "level": "INFO", "logger": "app.main",
+   "message": "Starting Bulking Control App..."}
+
+This keeps log lines machine-parseable and avoids the per-record format
+string parsing of `logging.basicConfig(format=...)`.
+
+Uvicorn's per-request access log is disabled (`--no-access-log`); instead
+`SampledAccessLogMiddleware` logs one in every N requests with its duration.
+"""
+
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy.engine import make_url
+
+
+class JsonFormatter(logging.Formatter):
+    """Render log records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc)
+            .isoformat(timespec="milliseconds")
+            .replace("+00:00", "Z"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            payload.update(fields)
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def configure_logging(level: int = logging.INFO) -> None:
+    """
+    Install the JSON formatter on the root logger.
+
+    Safe to call more than once: existing root handlers are replaced.
+    """
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter())
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+
+
+def redact_database_url(url: str) -> str:
+    """
+    Reduce a database URL to `host:port/dbname` for logging.
+
+    Credentials, driver and query parameters are dropped so they never
+    reach the logs.
+    """
+    parsed = make_url(url)
+    host = parsed.host or "localhost"
+    port = f":{parsed.port}" if parsed.port else ""
+    return f"{host}{port}/{parsed.database or ''}"
+
+
+class SampledAccessLogMiddleware:
+    """
+    Pure ASGI middleware that logs 1 in `sample_rate` HTTP requests.
+
+    Each sampled request is emitted on the `app.access` logger with structured
+    fields (method, path, status, duration_ms). Probe paths such as `/health`
+    are never logged. A `sample_rate` of 0 disables access logging entirely.
+    """
+
+    def __init__(
+        self,
+        app,
+        sample_rate: int = 100,
+        skip_paths: tuple[str, ...] = ("/health", "/metrics"),
+    ) -> None:
+        self.app = app
+        self.sample_rate = sample_rate
+        self.skip_paths = frozenset(skip_paths)
+        self._counter = 0
+        self._logger = logging.getLogger("app.access")
+
+    async def __call__(self, scope, receive, send) -> None:
+        if (
+            scope["type"] != "http"
+            or self.sample_rate <= 0
+            or scope["path"] in self.skip_paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        self._counter += 1
+        if self._counter % self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter_ns()
+
+        async def send_with_status(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration_ms = (time.perf_counter_ns() - start) / 1_000_000
+            self._logger.info(
+                "%s %s %d", scope["method"], scope["path"], status_code,
+                extra={"fields": {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    "duration_ms": round(duration_ms, 2),
+                }},
+            )
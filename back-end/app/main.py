@@ -4,12 +4,13 @@ Bulking Control App — Main Application Entry Point
 This is the FastAPI application factory. It:
   1. Creates the FastAPI app instance with metadata
   2. Registers all API routers
-  3. Sets up the database lifecycle (create tables on startup)
+  3. Sets up the database lifecycle (optionally create tables on startup)
   4. Configures CORS middleware for frontend integration
   5. Provides a health check endpoint
 
 To run locally (outside Docker):
-  uvicorn app.main:app --reload --host 0.0.0.0 --port 8000
+  python -m app.bootstrap   # create/migrate the schema
+  uvicorn app.main:app --reload --loop uvloop --http httptools --host 0.0.0.0 --port 8000
 
 To run with Docker:
   docker-compose up --build
@@ -18,54 +19,76 @@ To run with Docker:
 import logging
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import APIRouter, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from sqlalchemy import Numeric, text, update
+from sqlalchemy.orm import configure_mappers
 
-from app.core.config import settings
-from app.core.database import Base, async_engine
+from app.core.config import get_settings
+from app.core.database import Base, get_engine
+from app.core.logging_config import (
+    SampledAccessLogMiddleware,
+    configure_logging,
+    redact_database_url,
+)
 
 # Import all routers
 from app.routers import body_logs, coach, dashboard, diet, foods
-
-# Configure logging so we can see what's happening in the console
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+from app.services.body_fat import (
+    SKINFOLD_FIELDS,
+    skinfold_body_density_sql,
+    skinfold_body_fat_sql,
 )
+from app.services.diet_calculator import MEAL_ITEM_MACRO_COLUMNS, meal_item_macros_sql
+
+# Configure logging so we can see what's happening in the console (JSON lines)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 
 # ============================================================
-# APPLICATION LIFESPAN (Startup / Shutdown)
+# SCHEMA BOOTSTRAP
 # ============================================================
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """
-    Handles application startup and shutdown events.
-    
-    On STARTUP:
-      - Creates all database tables if they don't exist.
-      - This uses SQLAlchemy's create_all which is idempotent (safe to run multiple times).
-      - In a production app, you'd use Alembic migrations instead.
-    
-    On SHUTDOWN:
-      - Disposes the database engine (closes all connections).
+# Arbitrary app-wide key for pg_advisory_xact_lock ("bulk" in ASCII)
+SCHEMA_BOOTSTRAP_LOCK_ID = 0x62756C6B
+
+async def create_tables_and_migrate() -> None:
     """
-    # ----- STARTUP -----
-    logger.info("🚀 Starting Bulking Control App...")
-    logger.info(f"📦 Database URL: {settings.DATABASE_URL[:50]}...")
+    Create all tables and apply the inline schema migrations.
+
+    Run by `python -m app.bootstrap` before the API starts (the Docker image
+    does so on every start), or on startup when CREATE_TABLES_ON_STARTUP is
+    enabled (docker-compose/dev).
 
+    Every uvicorn worker runs its own lifespan, so the whole bootstrap holds a
+    transaction-scoped advisory lock: the first worker does the DDL and the
+    data migrations, the others wait and then find everything already in
+    place (all statements are idempotent). Without it, workers booting
+    together race on DDL and can insert duplicate default variations.
+    """
     # Create all tables defined in our models
     # run_sync() lets us run synchronous SQLAlchemy code in the async engine
-    async with async_engine.begin() as conn:
+    async with get_engine().begin() as conn:
+        # Released automatically when this transaction commits or rolls back
+        await conn.execute(
+            text("SELECT pg_advisory_xact_lock(:lock_id)"),
+            {"lock_id": SCHEMA_BOOTSTRAP_LOCK_ID},
+        )
+
         # Import models to ensure they're registered with Base.metadata
         from app import models  # noqa: F401
 
         await conn.run_sync(Base.metadata.create_all)
         logger.info("✅ Database tables created/verified successfully")
 
+        # Views depend on column types, so drop them while migrating and
+        # recreate them at the end
+        await conn.execute(text("DROP VIEW IF EXISTS variation_macro_totals"))
+
         # Migrations: add columns that create_all won't add to existing tables
-        from sqlalchemy import text
         await conn.execute(text(
             "ALTER TABLE diet_plans "
             "ADD COLUMN IF NOT EXISTS last_coach_adjustment_at TIMESTAMPTZ DEFAULT NULL"
@@ -96,6 +119,10 @@ async def lifespan(app: FastAPI):
             "SELECT dp.id FROM diet_plans dp "
             "WHERE NOT EXISTS (SELECT 1 FROM diet_variations dv WHERE dv.diet_plan_id = dp.id)"
         ))
+        has_meal_plan_id = await conn.scalar(text(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = 'meals' AND column_name = 'diet_plan_id'"
+        ))
         for row in existing_plans:
             plan_id = row[0]
             result = await conn.execute(text(
@@ -103,73 +130,279 @@ async def lifespan(app: FastAPI):
                 "VALUES (:plan_id, 'Principal', 0) RETURNING id"
             ), {"plan_id": plan_id})
             variation_id = result.scalar()
+            if has_meal_plan_id:
+                await conn.execute(text(
+                    "UPDATE meals SET variation_id = :var_id "
+                    "WHERE diet_plan_id = :plan_id AND variation_id IS NULL"
+                ), {"var_id": variation_id, "plan_id": plan_id})
+
+        # Migration: meals reach their plan through the variation, so the
+        # denormalized meals.diet_plan_id column is dropped. Any meal still
+        # without a variation is linked to its plan's first variation first.
+        if has_meal_plan_id:
+            await conn.execute(text(
+                "UPDATE meals m SET variation_id = ("
+                "  SELECT dv.id FROM diet_variations dv "
+                "  WHERE dv.diet_plan_id = m.diet_plan_id "
+                "  ORDER BY dv.order_index, dv.id LIMIT 1"
+                ") WHERE m.variation_id IS NULL"
+            ))
             await conn.execute(text(
-                "UPDATE meals SET variation_id = :var_id "
-                "WHERE diet_plan_id = :plan_id AND variation_id IS NULL"
-            ), {"var_id": variation_id, "plan_id": plan_id})
+                "ALTER TABLE meals "
+                "ALTER COLUMN variation_id SET NOT NULL, "
+                "DROP COLUMN diet_plan_id"
+            ))
+            logger.info("✅ Dropped meals.diet_plan_id")
 
-        logger.info("✅ Schema migrations applied")
+        # Migration: body_logs measurements moved from FLOAT to NUMERIC.
+        # All columns are converted in one ALTER so the table is rewritten once.
+        # A column holding a value that does not fit the new precision would
+        # make the ALTER (and so the whole bootstrap) fail, so it stays FLOAT
+        # until those rows are fixed.
+        float_columns = set((await conn.execute(text(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_name = 'body_logs' AND data_type = 'double precision'"
+        ))).scalars())
+        numeric_changes = []
+        for column in models.BodyLog.__table__.columns:
+            if column.name not in float_columns or type(column.type) is not Numeric:
+                continue
+            precision, scale = column.type.precision, column.type.scale
+            overflowing = await conn.scalar(text(
+                f"SELECT count(*) FROM body_logs "
+                f"WHERE abs(round({column.name}::numeric, {scale})) >= 1e{precision - scale}"
+            ))
+            if overflowing:
+                logger.warning(
+                    "⚠️ %s body logs have a %s value beyond NUMERIC(%s, %s) — "
+                    "keeping the column FLOAT until they are corrected",
+                    overflowing, column.name, precision, scale,
+                )
+                continue
+            numeric_changes.append(
+                f"ALTER COLUMN {column.name} TYPE NUMERIC({precision}, {scale}) "
+                f"USING round({column.name}::numeric, {scale})"
+            )
+        if numeric_changes:
+            await conn.execute(text("ALTER TABLE body_logs " + ", ".join(numeric_changes)))
+            logger.info("✅ Converted %s body_logs columns to NUMERIC", len(numeric_changes))
 
-    yield  # Application is running — handle requests
+        # Migration: stored Pollock/Siri results on body_logs, backfilled in SQL
+        # for logs written before the columns existed
+        await conn.execute(text(
+            "ALTER TABLE body_logs "
+            "ADD COLUMN IF NOT EXISTS calculated_body_density FLOAT DEFAULT NULL, "
+            "ADD COLUMN IF NOT EXISTS calculated_body_fat_percent FLOAT DEFAULT NULL"
+        ))
+        body_logs = models.BodyLog.__table__
+        skinfolds = [body_logs.c[field] for field in SKINFOLD_FIELDS]
+        backfill = await conn.execute(
+            update(body_logs)
+            .where(body_logs.c.calculated_body_density.is_(None))
+            .where(*(column.is_not(None) for column in skinfolds))
+            .values(
+                calculated_body_density=skinfold_body_density_sql(skinfolds),
+                calculated_body_fat_percent=skinfold_body_fat_sql(skinfolds),
+            )
+        )
+        if backfill.rowcount:
+            logger.info("✅ Backfilled body fat for %s body logs", backfill.rowcount)
 
-    # ----- SHUTDOWN -----
-    logger.info("🛑 Shutting down Bulking Control App...")
-    await async_engine.dispose()
-    logger.info("✅ Database connections closed")
+        # Migration: stored MealItem macros, backfilled from the food rows for
+        # items written before the columns existed
+        has_item_macros = await conn.scalar(text(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = 'meal_items' AND column_name = 'calculated_calories'"
+        ))
+        if not has_item_macros:
+            await conn.execute(text(
+                "ALTER TABLE meal_items "
+                + ", ".join(f"ADD COLUMN {name} FLOAT" for name in MEAL_ITEM_MACRO_COLUMNS)
+            ))
+            meal_items = models.MealItem.__table__
+            food_items = models.FoodItem.__table__
+            backfill = await conn.execute(
+                update(meal_items)
+                .where(meal_items.c.food_item_id == food_items.c.id)
+                .values(**meal_item_macros_sql(meal_items.c.quantity_grams, food_items.c))
+            )
+            await conn.execute(text(
+                "ALTER TABLE meal_items "
+                + ", ".join(f"ALTER COLUMN {name} SET NOT NULL" for name in MEAL_ITEM_MACRO_COLUMNS)
+            ))
+            logger.info("✅ Stored macros for %s meal items", backfill.rowcount)
+
+        # Migration: indexes/constraints that create_all won't add to existing tables
+        await conn.execute(text("DROP INDEX IF EXISTS ix_body_logs_date"))
+        has_meal_food_unique = await conn.scalar(text(
+            "SELECT 1 FROM pg_constraint WHERE conname = 'uq_meal_items_meal_food'"
+        ))
+        if not has_meal_food_unique:
+            # Merge repeated foods within a meal into their oldest row, summing
+            # the quantities (the rule add_item_to_meal applies to a repeated
+            # food); the stored macros are then recomputed from the merged
+            # quantity exactly as update_meal_item would write them, and the
+            # newer duplicate rows are deleted
+            merged_ids = (await conn.execute(text(
+                "WITH d AS ("
+                " SELECT min(id) AS keep_id, sum(quantity_grams) AS quantity_grams"
+                " FROM meal_items GROUP BY meal_id, food_item_id HAVING count(*) > 1"
+                ") UPDATE meal_items mi SET quantity_grams = d.quantity_grams"
+                " FROM d WHERE mi.id = d.keep_id RETURNING mi.id"
+            ))).scalars().all()
+            if merged_ids:
+                meal_items = models.MealItem.__table__
+                food_items = models.FoodItem.__table__
+                await conn.execute(
+                    update(meal_items)
+                    .where(meal_items.c.id.in_(merged_ids))
+                    .where(meal_items.c.food_item_id == food_items.c.id)
+                    .values(**meal_item_macros_sql(meal_items.c.quantity_grams, food_items.c))
+                )
+                deleted = await conn.execute(text(
+                    "DELETE FROM meal_items mi USING meal_items keep "
+                    "WHERE mi.meal_id = keep.meal_id "
+                    "AND mi.food_item_id = keep.food_item_id AND mi.id > keep.id"
+                ))
+                logger.warning(
+                    "⚠️ Merged repeated foods within a meal: %s meal items now hold "
+                    "the summed quantity and %s duplicate rows were deleted",
+                    len(merged_ids), deleted.rowcount,
+                )
+            await conn.execute(text(
+                "ALTER TABLE meal_items ADD CONSTRAINT uq_meal_items_meal_food "
+                "UNIQUE (meal_id, food_item_id)"
+            ))
+        await conn.execute(text("DROP INDEX IF EXISTS ix_meal_items_meal_id"))
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_diet_variations_plan_order "
+            "ON diet_variations (diet_plan_id, order_index)"
+        ))
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_meals_variation_order "
+            "ON meals (variation_id, order_index)"
+        ))
+        has_unique = await conn.scalar(text(
+            "SELECT 1 FROM pg_constraint WHERE conname = 'uq_body_logs_user_date'"
+        ))
+        if not has_unique:
+            duplicates = await conn.scalar(text(
+                "SELECT count(*) FROM (SELECT 1 FROM body_logs "
+                "GROUP BY user_id, date HAVING count(*) > 1) d"
+            ))
+            if duplicates:
+                logger.warning(
+                    "⚠️ %s duplicated (user_id, date) body logs found — "
+                    "skipping uq_body_logs_user_date until they are merged",
+                    duplicates,
+                )
+            else:
+                await conn.execute(text(
+                    "ALTER TABLE body_logs ADD CONSTRAINT uq_body_logs_user_date "
+                    "UNIQUE (user_id, date)"
+                ))
 
+        has_active_plan_index = await conn.scalar(text(
+            "SELECT 1 FROM pg_indexes WHERE indexname = 'uq_diet_plans_active_user'"
+        ))
+        if not has_active_plan_index:
+            duplicates = await conn.scalar(text(
+                "SELECT count(*) FROM (SELECT 1 FROM diet_plans WHERE is_active "
+                "GROUP BY user_id HAVING count(*) > 1) d"
+            ))
+            if duplicates:
+                logger.warning(
+                    "⚠️ %s users have more than one active diet plan — "
+                    "skipping uq_diet_plans_active_user until they are deactivated",
+                    duplicates,
+                )
+            else:
+                await conn.execute(text(
+                    "CREATE UNIQUE INDEX uq_diet_plans_active_user "
+                    "ON diet_plans (user_id) WHERE is_active"
+                ))
 
-# ============================================================
-# CREATE THE FASTAPI APPLICATION
-# ============================================================
-app = FastAPI(
-    title=settings.APP_NAME,
-    version=settings.APP_VERSION,
-    description=(
-        "Backend API for the Bulking Control App. "
-        "Tracks nutrition, body metrics, and provides intelligent diet adjustments "
-        "for optimal weight gain during a bulking phase."
-    ),
-    lifespan=lifespan,
-    # OpenAPI docs configuration
-    docs_url="/docs",        # Swagger UI at /docs
-    redoc_url="/redoc",      # ReDoc at /redoc
-)
+        await conn.execute(text(models.VARIATION_MACRO_TOTALS_VIEW_SQL))
+
+        logger.info("✅ Schema migrations applied")
 
 
 # ============================================================
-# CORS MIDDLEWARE
+# WARM-UP
 # ============================================================
-# Allow all origins during development. In production, restrict to your frontend URL.
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],         # Change to ["http://localhost:3000"] in production
-    allow_credentials=True,
-    allow_methods=["*"],         # Allow all HTTP methods (GET, POST, PUT, DELETE, etc.)
-    allow_headers=["*"],         # Allow all headers
-)
+def _warm_up(app: FastAPI) -> None:
+    """
+    Do the lazy one-time setup work now instead of on the first request.
+
+      - SQLAlchemy configures mappers (relationship resolution) on first use.
+      - Pydantic models with unresolved forward refs finish building their
+        validators on first use; model_rebuild() is a no-op for complete ones.
+    """
+    configure_mappers()
+
+    for route in app.routes:
+        response_model = getattr(route, "response_model", None)
+        if isinstance(response_model, type) and issubclass(response_model, BaseModel):
+            response_model.model_rebuild()
+
+    logger.info("✅ Mappers and response models warmed up")
 
 
 # ============================================================
-# REGISTER ROUTERS
+# APPLICATION LIFESPAN (Startup / Shutdown)
 # ============================================================
-# Each router handles a specific domain of the application.
-# The prefix is already defined in each router file.
-app.include_router(foods.router)        # /foods/*
-app.include_router(diet.router)         # /diet/*
-app.include_router(body_logs.router)    # /body-logs/*
-app.include_router(dashboard.router)    # /dashboard/*
-app.include_router(coach.router)        # /coach/*
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Handles application startup and shutdown events.
+    
+    On STARTUP:
+      - When CREATE_TABLES_ON_STARTUP is enabled, creates all database tables
+        if they don't exist and applies the inline schema migrations.
+      - This uses SQLAlchemy's create_all which is idempotent (safe to run multiple times).
+      - In production leave the flag off and run `python -m app.bootstrap`
+        once before starting the workers (the Docker image does).
+      - Warms up ORM mappers and response models so the first request is not slower.
+    
+    On SHUTDOWN:
+      - Disposes the database engine (closes all connections).
+    """
+    settings = get_settings()
+
+    # ----- STARTUP -----
+    logger.info("🚀 Starting Bulking Control App...")
+    logger.info("📦 Database: %s", redact_database_url(settings.DATABASE_URL))
+
+    # Schema bootstrap is opt-in: it opens a connection and issues DDL for every
+    # model, which only slows down restarts once the schema is managed elsewhere.
+    if settings.CREATE_TABLES_ON_STARTUP:
+        await create_tables_and_migrate()
+    else:
+        logger.info("⏭️ Skipping table creation (CREATE_TABLES_ON_STARTUP is disabled)")
+
+    _warm_up(app)
+
+    yield  # Application is running — handle requests
+
+    # ----- SHUTDOWN -----
+    logger.info("🛑 Shutting down Bulking Control App...")
+    await get_engine().dispose()
+    logger.info("✅ Database connections closed")
 
 
 # ============================================================
-# ROOT / HEALTH CHECK ENDPOINT
+# ROOT / HEALTH CHECK ENDPOINTS
 # ============================================================
-@app.get("/", tags=["Health"])
+health_router = APIRouter(tags=["Health"])
+
+
+@health_router.get("/")
 async def root():
     """
     Root endpoint — serves as a health check.
     Returns basic app info to confirm the API is running.
     """
+    settings = get_settings()
     return {
         "app": settings.APP_NAME,
         "version": settings.APP_VERSION,
@@ -178,10 +411,81 @@ async def root():
     }
 
 
-@app.get("/health", tags=["Health"])
+@health_router.get("/health")
 async def health_check():
     """
     Health check endpoint for Docker/Kubernetes health probes.
     Returns 200 if the application is running.
     """
     return {"status": "ok"}
+
+
+# ============================================================
+# CREATE THE FASTAPI APPLICATION
+# ============================================================
+def create_app() -> FastAPI:
+    """
+    Build the FastAPI application from the current settings.
+
+    Settings are read here rather than at import time, so tests can change
+    them (`get_settings.cache_clear()`) and build a fresh app.
+    """
+    settings = get_settings()
+
+    app = FastAPI(
+        title=settings.APP_NAME,
+        version=settings.APP_VERSION,
+        description=(
+            "Backend API for the Bulking Control App. "
+            "Tracks nutrition, body metrics, and provides intelligent diet adjustments "
+            "for optimal weight gain during a bulking phase."
+        ),
+        lifespan=lifespan,
+        # orjson encodes the large float/date lists (foods, body logs) much faster
+        # than the stdlib json used by the default JSONResponse
+        default_response_class=ORJSONResponse,
+        # OpenAPI docs configuration
+        docs_url="/docs",        # Swagger UI at /docs
+        redoc_url="/redoc",      # ReDoc at /redoc
+    )
+
+    # ----- CORS MIDDLEWARE -----
+    # Only the configured front-end origins are allowed (see Settings.ALLOWED_ORIGINS).
+    # Explicit lists keep Starlette off the wildcard code paths, which echo the
+    # request's Origin/headers back on every response.
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.ALLOWED_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
+        allow_headers=["Authorization", "Content-Type"],
+    )
+
+    # ----- GZIP COMPRESSION -----
+    # JSON lists (foods, body logs, dashboard history) compress 5–10x. Responses
+    # under 1 KB are sent as-is since compressing them costs more than it saves.
+    app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+    # ----- SAMPLED ACCESS LOG -----
+    # Replaces uvicorn's per-request access log (run with --no-access-log).
+    # Added last so it wraps the other middleware and times the whole request.
+    app.add_middleware(
+        SampledAccessLogMiddleware,
+        sample_rate=settings.ACCESS_LOG_SAMPLE_RATE,
+    )
+
+    # ----- REGISTER ROUTERS -----
+    # Each router handles a specific domain of the application.
+    # The prefix is already defined in each router file.
+    app.include_router(foods.router)        # /foods/*
+    app.include_router(diet.router)         # /diet/*
+    app.include_router(body_logs.router)    # /body-logs/*
+    app.include_router(dashboard.router)    # /dashboard/*
+    app.include_router(coach.router)        # /coach/*
+    app.include_router(health_router)       # /, /health
+
+    return app
+
+
+# The instance uvicorn serves (app.main:app)
+app = create_app()
@@ -4,14 +4,23 @@ SQLAlchemy ORM Models
 Defines all database tables for the Bulking Control App.
 
 Entity Relationships:
-  - DietPlan (1) ---> (N) Meal          : A plan has many meals
+  - DietPlan (1) ---> (N) DietVariation : A plan has many variations
+  - DietVariation (1) ---> (N) Meal     : A variation has many meals
   - Meal (1)     ---> (N) MealItem      : A meal has many items
   - FoodItem (1) ---> (N) MealItem      : A food can appear in many meal items
-  - BodyLog is standalone (one record per date)
+  - BodyLog is standalone (one record per user per date)
+
+Views:
+  - variation_macro_totals : macro totals per DietVariation, summed in SQL
+
+Relationships use the default lazy loading. Queries that need the children
+must eager-load them explicitly with `selectinload(...)` — lazy loads are not
+allowed on an AsyncSession outside of SQLAlchemy's own greenlet context.
 
 IMPORTANT: All nutritional values in FoodItem are stored per 100g.
 The actual consumed amount is calculated at the MealItem level using:
   total_macro = (quantity_grams / 100) * food_item.macro_per_100g
+and stored on the MealItem when it is written.
 """
 
 from datetime import date, datetime
@@ -22,9 +31,15 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
+    Numeric,
     String,
+    UniqueConstraint,
+    column,
     func,
+    table,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -65,7 +80,7 @@ class FoodItem(Base):
 
     # Relationship: a food can be referenced by many MealItems
     meal_items: Mapped[list["MealItem"]] = relationship(
-        "MealItem", back_populates="food_item", lazy="selectin"
+        "MealItem", back_populates="food_item"
     )
 
     def __repr__(self) -> str:
@@ -83,6 +98,14 @@ class DietPlan(Base):
     Contains daily macro targets that the user is aiming for.
     """
     __tablename__ = "diet_plans"
+    __table_args__ = (
+        # At most one active plan per user. Partial unique index: it also
+        # serves every "active plan for user X" lookup (is_active == True).
+        Index(
+            "uq_diet_plans_active_user", "user_id",
+            unique=True, postgresql_where=text("is_active"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
 
@@ -127,18 +150,12 @@ class DietPlan(Base):
 
     # Relationship: a plan has many variations (e.g., "Principal", "Substituição")
     variations: Mapped[list["DietVariation"]] = relationship(
-        "DietVariation", back_populates="diet_plan", lazy="selectin",
+        "DietVariation", back_populates="diet_plan",
         cascade="all, delete-orphan",
+        passive_deletes=True,          # ON DELETE CASCADE removes the children
         order_by="DietVariation.order_index",
     )
 
-    # Relationship: a plan has many meals (e.g., Breakfast, Lunch, Dinner)
-    meals: Mapped[list["Meal"]] = relationship(
-        "Meal", back_populates="diet_plan", lazy="selectin",
-        cascade="all, delete-orphan",  # Delete meals when plan is deleted
-        order_by="Meal.order_index",   # Always return meals in order
-    )
-
     def __repr__(self) -> str:
         return f"<DietPlan(id={self.id}, user='{self.user_id}', active={self.is_active})>"
 
@@ -157,6 +174,11 @@ class DietVariation(Base):
     The order_index controls display order (0 = first / default variation).
     """
     __tablename__ = "diet_variations"
+    __table_args__ = (
+        # Variations are always read per plan in display order; the index
+        # returns them already sorted and also serves the FK cascade.
+        Index("ix_diet_variations_plan_order", "diet_plan_id", "order_index"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
 
@@ -178,8 +200,9 @@ class DietVariation(Base):
     # Relationships
     diet_plan: Mapped["DietPlan"] = relationship("DietPlan", back_populates="variations")
     meals: Mapped[list["Meal"]] = relationship(
-        "Meal", back_populates="variation", lazy="selectin",
+        "Meal", back_populates="variation",
         cascade="all, delete-orphan",
+        passive_deletes=True,          # ON DELETE CASCADE removes the children
         order_by="Meal.order_index",
     )
 
@@ -198,17 +221,19 @@ class Meal(Base):
     Each meal contains multiple MealItems (the actual foods being eaten).
     """
     __tablename__ = "meals"
+    __table_args__ = (
+        # Meals are always read per variation in display order; the index
+        # returns them already sorted and also serves the FK cascade.
+        Index("ix_meals_variation_order", "variation_id", "order_index"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
 
-    # Which diet plan this meal belongs to (kept for backward compatibility)
-    diet_plan_id: Mapped[int] = mapped_column(
-        Integer, ForeignKey("diet_plans.id", ondelete="CASCADE"), nullable=False
-    )
-
-    # Which variation this meal belongs to (nullable for migration of existing data)
-    variation_id: Mapped[int | None] = mapped_column(
-        Integer, ForeignKey("diet_variations.id", ondelete="CASCADE"), nullable=True
+    # Which variation this meal belongs to. The owning plan is reached
+    # through the variation (meal.variation.diet_plan), so it is not
+    # duplicated on every meal row.
+    variation_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("diet_variations.id", ondelete="CASCADE"), nullable=False
     )
 
     # Human-readable name like "Breakfast", "Lunch", "Pre-workout snack"
@@ -218,11 +243,12 @@ class Meal(Base):
     order_index: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
 
     # Relationships
-    diet_plan: Mapped["DietPlan"] = relationship("DietPlan", back_populates="meals")
-    variation: Mapped["DietVariation | None"] = relationship("DietVariation", back_populates="meals")
+    variation: Mapped["DietVariation"] = relationship("DietVariation", back_populates="meals")
     items: Mapped[list["MealItem"]] = relationship(
-        "MealItem", back_populates="meal", lazy="selectin",
+        "MealItem", back_populates="meal",
         cascade="all, delete-orphan",
+        passive_deletes=True,          # ON DELETE CASCADE removes the children
+        order_by="MealItem.id",        # Stable order (insertion order)
     )
 
     def __repr__(self) -> str:
@@ -247,8 +273,18 @@ class MealItem(Base):
     
     Example: If the user eats 200g of Chicken Breast (165 kcal/100g):
       total_calories = (200 / 100) * 165 = 330 kcal
+
+    The results are stored in the calculated_* columns.
     """
     __tablename__ = "meal_items"
+    __table_args__ = (
+        # A food appears at most once per meal, so a retried "add item"
+        # updates the existing row instead of adding a duplicate (see
+        # add_item_to_meal). The backing (meal_id, food_item_id) btree also
+        # serves every "items of meal X" lookup, so meal_id needs no index
+        # of its own.
+        UniqueConstraint("meal_id", "food_item_id", name="uq_meal_items_meal_food"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
 
@@ -265,33 +301,19 @@ class MealItem(Base):
     # The actual amount the user eats, in grams
     quantity_grams: Mapped[float] = mapped_column(Float, nullable=False)
 
+    # Actual macros for quantity_grams of the food, rounded to 2 decimals.
+    # Food macros never change, so these are computed when the item is
+    # written (see app.services.diet_calculator.meal_item_macros_sql) and
+    # reads never recalculate them.
+    calculated_calories: Mapped[float] = mapped_column(Float, nullable=False)
+    calculated_protein: Mapped[float] = mapped_column(Float, nullable=False)
+    calculated_carbs: Mapped[float] = mapped_column(Float, nullable=False)
+    calculated_fat: Mapped[float] = mapped_column(Float, nullable=False)
+
     # Relationships
     meal: Mapped["Meal"] = relationship("Meal", back_populates="items")
     food_item: Mapped["FoodItem"] = relationship("FoodItem", back_populates="meal_items")
 
-    # ----- Computed Properties (not stored in DB) -----
-    # These calculate the actual macros based on the quantity eaten.
-
-    @property
-    def calculated_calories(self) -> float:
-        """Calculate actual calories based on quantity eaten."""
-        return round((self.quantity_grams / 100) * self.food_item.calories_kcal, 2)
-
-    @property
-    def calculated_protein(self) -> float:
-        """Calculate actual protein based on quantity eaten."""
-        return round((self.quantity_grams / 100) * self.food_item.protein_g, 2)
-
-    @property
-    def calculated_carbs(self) -> float:
-        """Calculate actual carbs based on quantity eaten."""
-        return round((self.quantity_grams / 100) * self.food_item.carbs_g, 2)
-
-    @property
-    def calculated_fat(self) -> float:
-        """Calculate actual fat based on quantity eaten."""
-        return round((self.quantity_grams / 100) * self.food_item.fat_g, 2)
-
     def __repr__(self) -> str:
         return f"<MealItem(id={self.id}, food_id={self.food_item_id}, qty={self.quantity_grams}g)>"
 
@@ -299,6 +321,13 @@ class MealItem(Base):
 # ============================================================
 # BODY LOG — Daily/Weekly body measurements and progress
 # ============================================================
+# Fixed-point column types for body measurements. Two decimals is more than
+# any scale, caliper or tape provides, and NUMERIC(5,2)/(6,2) values take less
+# space than 8-byte aligned floats. asdecimal=False keeps them as Python floats.
+Measurement = Numeric(5, 2, asdecimal=False)   # up to 999.99 (mm, cm, %, kg)
+Weight = Numeric(6, 2, asdecimal=False)        # up to 9999.99 kg
+
+
 class BodyLog(Base):
     """
     Stores the user's body measurements for a given date.
@@ -314,52 +343,65 @@ class BodyLog(Base):
     allows gradual adoption of more detailed tracking.
     """
     __tablename__ = "body_logs"
+    __table_args__ = (
+        # One log per user per day. The backing (user_id, date) btree also
+        # serves every "logs for user X ordered by date" query: PostgreSQL
+        # walks it backward for ORDER BY date DESC (Index Scan Backward), so
+        # a separate (user_id, date DESC) index would only add write cost.
+        UniqueConstraint("user_id", "date", name="uq_body_logs_user_date"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
 
-    # The date of the measurement (only one log per date ideally)
-    date: Mapped[date] = mapped_column(Date, nullable=False, index=True)
+    # The date of the measurement (one log per date per user)
+    date: Mapped[date] = mapped_column(Date, nullable=False)
 
     # User identifier (same as in DietPlan)
     user_id: Mapped[str] = mapped_column(String(100), nullable=False, default="default_user")
 
     # ----- Basic Measurement -----
-    weight_kg: Mapped[float] = mapped_column(Float, nullable=False)
+    weight_kg: Mapped[float] = mapped_column(Weight, nullable=False)
 
     # ----- Bioimpedance Fields (from smart scale / InBody) -----
     # These come from electronic devices that estimate body composition
-    bio_body_fat_percent: Mapped[float | None] = mapped_column(Float, nullable=True)
-    bio_muscle_mass_kg: Mapped[float | None] = mapped_column(Float, nullable=True)
+    bio_body_fat_percent: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    bio_muscle_mass_kg: Mapped[float | None] = mapped_column(Measurement, nullable=True)
 
     # ----- Skinfold Fields (Pollock 7-fold protocol) -----
     # Measured with a caliper in millimeters (mm)
     # These 7 sites are used to calculate body density and then body fat %
-    skinfold_chest: Mapped[float | None] = mapped_column(Float, nullable=True)
-    skinfold_axillary: Mapped[float | None] = mapped_column(Float, nullable=True)
-    skinfold_triceps: Mapped[float | None] = mapped_column(Float, nullable=True)
-    skinfold_subscapular: Mapped[float | None] = mapped_column(Float, nullable=True)
-    skinfold_suprailiac: Mapped[float | None] = mapped_column(Float, nullable=True)
-    skinfold_abdominal: Mapped[float | None] = mapped_column(Float, nullable=True)
-    skinfold_thigh: Mapped[float | None] = mapped_column(Float, nullable=True)
+    skinfold_chest: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    skinfold_axillary: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    skinfold_triceps: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    skinfold_subscapular: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    skinfold_suprailiac: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    skinfold_abdominal: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    skinfold_thigh: Mapped[float | None] = mapped_column(Measurement, nullable=True)
 
     # ----- Circumference Fields (in centimeters) -----
     # Tape measurements taken around various body parts
-    circ_neck: Mapped[float | None] = mapped_column(Float, nullable=True)
-    circ_shoulder: Mapped[float | None] = mapped_column(Float, nullable=True)
-    circ_chest_relaxed: Mapped[float | None] = mapped_column(Float, nullable=True)
-    circ_arm_relaxed_right: Mapped[float | None] = mapped_column(Float, nullable=True)
-    circ_arm_relaxed_left: Mapped[float | None] = mapped_column(Float, nullable=True)
-    circ_arm_contracted_right: Mapped[float | None] = mapped_column(Float, nullable=True)
-    circ_arm_contracted_left: Mapped[float | None] = mapped_column(Float, nullable=True)
-    circ_forearm_right: Mapped[float | None] = mapped_column(Float, nullable=True)
-    circ_forearm_left: Mapped[float | None] = mapped_column(Float, nullable=True)
-    circ_waist: Mapped[float | None] = mapped_column(Float, nullable=True)
-    circ_abdomen: Mapped[float | None] = mapped_column(Float, nullable=True)
-    circ_hips: Mapped[float | None] = mapped_column(Float, nullable=True)
-    circ_thigh_proximal_right: Mapped[float | None] = mapped_column(Float, nullable=True)
-    circ_thigh_proximal_left: Mapped[float | None] = mapped_column(Float, nullable=True)
-    circ_calf_right: Mapped[float | None] = mapped_column(Float, nullable=True)
-    circ_calf_left: Mapped[float | None] = mapped_column(Float, nullable=True)
+    circ_neck: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    circ_shoulder: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    circ_chest_relaxed: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    circ_arm_relaxed_right: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    circ_arm_relaxed_left: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    circ_arm_contracted_right: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    circ_arm_contracted_left: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    circ_forearm_right: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    circ_forearm_left: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    circ_waist: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    circ_abdomen: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    circ_hips: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    circ_thigh_proximal_right: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    circ_thigh_proximal_left: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    circ_calf_right: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+    circ_calf_left: Mapped[float | None] = mapped_column(Measurement, nullable=True)
+
+    # ----- Calculated Fields (Pollock 7-fold + Siri) -----
+    # Computed when the log is written so reads never recalculate them.
+    # NULL unless all 7 skinfolds are present.
+    calculated_body_density: Mapped[float | None] = mapped_column(Float, nullable=True)
+    calculated_body_fat_percent: Mapped[float | None] = mapped_column(Float, nullable=True)
 
     # Timestamp for when this log entry was created
     created_at: Mapped[datetime] = mapped_column(
@@ -368,3 +410,39 @@ class BodyLog(Base):
 
     def __repr__(self) -> str:
         return f"<BodyLog(id={self.id}, date={self.date}, weight={self.weight_kg}kg)>"
+
+
+# ============================================================
+# VARIATION MACRO TOTALS — SQL view (read-only)
+# ============================================================
+# Per-variation sums of the stored MealItem.calculated_* macros (already
+# rounded per item). A plain (non-materialized) view: it is always
+# consistent with the meal items and costs one indexed aggregate to read.
+#
+# The view is not part of Base.metadata (create_all would make it a table); the
+# startup bootstrap drops it before its migrations and recreates it afterwards,
+# since PostgreSQL refuses column type changes on tables a view depends on.
+VARIATION_MACRO_TOTALS_VIEW_SQL = """
+CREATE OR REPLACE VIEW variation_macro_totals AS
+SELECT
+    dv.id AS variation_id,
+    dv.diet_plan_id,
+    COALESCE(SUM(mi.calculated_calories::numeric), 0) AS total_calories,
+    COALESCE(SUM(mi.calculated_protein::numeric), 0) AS total_protein,
+    COALESCE(SUM(mi.calculated_carbs::numeric), 0) AS total_carbs,
+    COALESCE(SUM(mi.calculated_fat::numeric), 0) AS total_fat
+FROM diet_variations dv
+LEFT JOIN meals m ON m.variation_id = dv.id
+LEFT JOIN meal_items mi ON mi.meal_id = m.id
+GROUP BY dv.id, dv.diet_plan_id
+"""
+
+variation_macro_totals = table(
+    "variation_macro_totals",
+    column("variation_id", Integer),
+    column("diet_plan_id", Integer),
+    column("total_calories", Numeric),
+    column("total_protein", Numeric),
+    column("total_carbs", Numeric),
+    column("total_fat", Numeric),
+)
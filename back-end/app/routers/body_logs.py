@@ -13,24 +13,47 @@ import logging
 from datetime import date
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+import orjson
+from fastapi import APIRouter, HTTPException, Query, Response
+from sqlalchemy import bindparam, delete, insert, literal, select
+from sqlalchemy import update as sa_update
+from sqlalchemy.exc import IntegrityError
 
-from app.core.database import get_db
+from app.core.database import DB, violated_constraint
 from app.models import BodyLog
 from app.schemas import BodyLogCreate, BodyLogResponse, BodyLogUpdate, MessageResponse
-from app.services.body_fat import calculate_body_fat_from_skinfolds
+from app.services.body_fat import (
+    SKINFOLD_FIELDS,
+    calculated_body_fat_fields,
+    skinfold_body_density_sql,
+    skinfold_body_fat_sql,
+)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/body-logs", tags=["Body Logs"])
 
+# Columns returned by the list endpoint, in BodyLogResponse field order.
+# Every response field is a stored column (body fat included).
+_BODY_LOG_RESPONSE_COLUMNS = tuple(
+    BodyLog.__table__.c[field] for field in BodyLogResponse.model_fields
+)
+
+# Single-row statements built once at import time; each request only binds
+# `log_id`, so SQLAlchemy reuses the cached compiled form and asyncpg its
+# prepared statement, with no per-call statement construction.
+_SELECT_BODY_LOG_BY_ID = select(BodyLog).where(BodyLog.id == bindparam("log_id"))
+_DELETE_BODY_LOG_BY_ID = (
+    delete(BodyLog)
+    .where(BodyLog.id == bindparam("log_id"))
+    .returning(BodyLog.date)
+)
+
 
 @router.post("/", response_model=BodyLogResponse, status_code=201)
 async def create_body_log(
     log: BodyLogCreate,
-    db: AsyncSession = Depends(get_db),
+    db: DB,
 ):
     """
     Create a new body measurement log entry.
@@ -46,45 +69,37 @@ async def create_body_log(
     If all 7 skinfold measurements are provided, body density and body fat %
     are automatically calculated using the Pollock 7-fold method.
     """
-    # Create the database record from the request data
-    db_log = BodyLog(**log.model_dump())
-
-    db.add(db_log)
-    await db.commit()
-    await db.refresh(db_log)
-
-    # Build the response
-    response_data = BodyLogResponse.model_validate(db_log)
-
-    # If all 7 skinfold measurements are present, calculate body fat
-    if _has_all_skinfolds(log):
-        body_fat_result = calculate_body_fat_from_skinfolds(
-            chest=log.skinfold_chest,  # type: ignore
-            axillary=log.skinfold_axillary,  # type: ignore
-            triceps=log.skinfold_triceps,  # type: ignore
-            subscapular=log.skinfold_subscapular,  # type: ignore
-            suprailiac=log.skinfold_suprailiac,  # type: ignore
-            abdominal=log.skinfold_abdominal,  # type: ignore
-            thigh=log.skinfold_thigh,  # type: ignore
-        )
-        response_data.calculated_body_density = body_fat_result["body_density"]
-        response_data.calculated_body_fat_percent = body_fat_result["body_fat_percent"]
-
+    # Body fat is calculated once here and stored with the log
+    payload = log.model_dump()
+    payload.update(calculated_body_fat_fields(log))
+
+    # INSERT ... RETURNING gives back the stored row (incl. id and created_at)
+    # without a separate refresh query
+    try:
+        db_log = await db.scalar(insert(BodyLog).values(**payload).returning(BodyLog))
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        if violated_constraint(exc) != "uq_body_logs_user_date":
+            raise
+        raise _duplicate_date_error(log.date) from exc
+
+    if db_log.calculated_body_fat_percent is not None:
         logger.info(
-            f"Body fat calculated for log {db_log.id}: "
-            f"{body_fat_result['body_fat_percent']}% "
-            f"(density: {body_fat_result['body_density']})"
+            "Body fat calculated for log %s: %s%% (density: %s)",
+            db_log.id, db_log.calculated_body_fat_percent, db_log.calculated_body_density,
         )
 
     logger.info(
-        f"Created body log ID {db_log.id} for date {db_log.date}: "
-        f"weight={db_log.weight_kg}kg"
+        "Created body log ID %s for date %s: weight=%skg",
+        db_log.id, db_log.date, db_log.weight_kg,
     )
-    return response_data
+    return BodyLogResponse.model_validate(db_log)
 
 
 @router.get("/", response_model=list[BodyLogResponse])
 async def list_body_logs(
+    db: DB,
     user_id: str = Query(default="default_user", description="User identifier"),
     start_date: Optional[date] = Query(
         default=None, description="Filter logs from this date (inclusive)"
@@ -94,7 +109,6 @@ async def list_body_logs(
     ),
     skip: int = Query(default=0, ge=0, description="Pagination offset"),
     limit: int = Query(default=50, ge=1, le=200, description="Max records to return"),
-    db: AsyncSession = Depends(get_db),
 ):
     """
     List body log entries with optional date range filtering.
@@ -107,7 +121,7 @@ async def list_body_logs(
       GET /body-logs/?start_date=2024-01-01        -> Logs from Jan 1 onwards
       GET /body-logs/?start_date=2024-01-01&end_date=2024-01-31 -> January only
     """
-    stmt = select(BodyLog).where(BodyLog.user_id == user_id)
+    stmt = select(*_BODY_LOG_RESPONSE_COLUMNS).where(BodyLog.user_id == user_id)
 
     # Apply date filters if provided
     if start_date:
@@ -119,45 +133,28 @@ async def list_body_logs(
     stmt = stmt.order_by(BodyLog.date.desc()).offset(skip).limit(limit)
 
     result = await db.execute(stmt)
-    logs = result.scalars().all()
-
-    # For each log, calculate body fat if skinfolds are present
-    response_logs = []
-    for log in logs:
-        response_data = BodyLogResponse.model_validate(log)
-
-        # Check if this log has all 7 skinfolds and calculate body fat
-        if _log_has_all_skinfolds(log):
-            body_fat_result = calculate_body_fat_from_skinfolds(
-                chest=log.skinfold_chest,
-                axillary=log.skinfold_axillary,
-                triceps=log.skinfold_triceps,
-                subscapular=log.skinfold_subscapular,
-                suprailiac=log.skinfold_suprailiac,
-                abdominal=log.skinfold_abdominal,
-                thigh=log.skinfold_thigh,
-            )
-            response_data.calculated_body_density = body_fat_result["body_density"]
-            response_data.calculated_body_fat_percent = body_fat_result["body_fat_percent"]
-
-        response_logs.append(response_data)
 
-    return response_logs
+    # The projected rows already have the response shape, so they are encoded
+    # straight to JSON without building ORM objects or pydantic models.
+    # OPT_UTC_Z renders created_at with a "Z" suffix, as pydantic does.
+    return Response(
+        orjson.dumps([dict(row) for row in result.mappings()], option=orjson.OPT_UTC_Z),
+        media_type="application/json",
+    )
 
 
 @router.get("/{log_id}", response_model=BodyLogResponse)
 async def get_body_log(
     log_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: DB,
 ):
     """
     Get a specific body log entry by ID.
     
-    If skinfold measurements are present, body fat % is automatically
-    calculated and included in the response.
+    If all skinfold measurements are present, the stored body density and
+    body fat % are included in the response.
     """
-    stmt = select(BodyLog).where(BodyLog.id == log_id)
-    result = await db.execute(stmt)
+    result = await db.execute(_SELECT_BODY_LOG_BY_ID, {"log_id": log_id})
     log = result.scalar_one_or_none()
 
     if not log:
@@ -166,30 +163,14 @@ async def get_body_log(
             detail=f"Body log with ID {log_id} not found."
         )
 
-    response_data = BodyLogResponse.model_validate(log)
-
-    # Calculate body fat if all skinfolds are present
-    if _log_has_all_skinfolds(log):
-        body_fat_result = calculate_body_fat_from_skinfolds(
-            chest=log.skinfold_chest,
-            axillary=log.skinfold_axillary,
-            triceps=log.skinfold_triceps,
-            subscapular=log.skinfold_subscapular,
-            suprailiac=log.skinfold_suprailiac,
-            abdominal=log.skinfold_abdominal,
-            thigh=log.skinfold_thigh,
-        )
-        response_data.calculated_body_density = body_fat_result["body_density"]
-        response_data.calculated_body_fat_percent = body_fat_result["body_fat_percent"]
-
-    return response_data
+    return BodyLogResponse.model_validate(log)
 
 
 @router.put("/{log_id}", response_model=BodyLogResponse)
 async def update_body_log(
     log_id: int,
     update: BodyLogUpdate,
-    db: AsyncSession = Depends(get_db),
+    db: DB,
 ):
     """
     Update an existing body log entry.
@@ -197,9 +178,42 @@ async def update_body_log(
     Only the fields provided in the request body will be updated.
     Fields not included will remain unchanged.
     """
-    stmt = select(BodyLog).where(BodyLog.id == log_id)
-    result = await db.execute(stmt)
-    log = result.scalar_one_or_none()
+    # Update only the fields that were explicitly provided
+    update_data = update.model_dump(exclude_unset=True)
+    if not update_data:
+        return await get_body_log(log_id, db)
+
+    values = dict(update_data)
+
+    # Keep the stored body fat in sync when any skinfold changed. The
+    # calculation runs inside the UPDATE, where unchanged skinfolds still
+    # read the stored values, so the row does not have to be loaded first.
+    if not update_data.keys().isdisjoint(SKINFOLD_FIELDS):
+        skinfolds = [
+            literal(update_data[field], BodyLog.__table__.c[field].type)
+            if field in update_data
+            else BodyLog.__table__.c[field]
+            for field in SKINFOLD_FIELDS
+        ]
+        values["calculated_body_density"] = skinfold_body_density_sql(skinfolds)
+        values["calculated_body_fat_percent"] = skinfold_body_fat_sql(skinfolds)
+
+    # UPDATE ... RETURNING gives back the updated row in the same round trip
+    stmt = (
+        sa_update(BodyLog)
+        .where(BodyLog.id == log_id)
+        .values(**values)
+        .returning(BodyLog)
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        log = await db.scalar(stmt)
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        if violated_constraint(exc) != "uq_body_logs_user_date":
+            raise
+        raise _duplicate_date_error(update_data.get("date")) from exc
 
     if not log:
         raise HTTPException(
@@ -207,90 +221,42 @@ async def update_body_log(
             detail=f"Body log with ID {log_id} not found."
         )
 
-    # Update only the fields that were explicitly provided
-    update_data = update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(log, field, value)
-
-    await db.commit()
-    await db.refresh(log)
-
-    # Build response with optional body fat calculation
-    response_data = BodyLogResponse.model_validate(log)
-    if _log_has_all_skinfolds(log):
-        body_fat_result = calculate_body_fat_from_skinfolds(
-            chest=log.skinfold_chest,
-            axillary=log.skinfold_axillary,
-            triceps=log.skinfold_triceps,
-            subscapular=log.skinfold_subscapular,
-            suprailiac=log.skinfold_suprailiac,
-            abdominal=log.skinfold_abdominal,
-            thigh=log.skinfold_thigh,
-        )
-        response_data.calculated_body_density = body_fat_result["body_density"]
-        response_data.calculated_body_fat_percent = body_fat_result["body_fat_percent"]
-
-    logger.info(f"Updated body log ID {log_id}")
-    return response_data
+    logger.info("Updated body log ID %s", log_id)
+    return BodyLogResponse.model_validate(log)
 
 
 @router.delete("/{log_id}", response_model=MessageResponse)
 async def delete_body_log(
     log_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: DB,
 ):
     """
     Delete a body log entry.
     """
-    stmt = select(BodyLog).where(BodyLog.id == log_id)
-    result = await db.execute(stmt)
-    log = result.scalar_one_or_none()
+    # DELETE ... RETURNING reports both the match and the date for the message
+    log_date = await db.scalar(_DELETE_BODY_LOG_BY_ID, {"log_id": log_id})
 
-    if not log:
+    if log_date is None:
         raise HTTPException(
             status_code=404,
             detail=f"Body log with ID {log_id} not found."
         )
 
-    await db.delete(log)
     await db.commit()
 
-    logger.info(f"Deleted body log ID {log_id}")
+    logger.info("Deleted body log ID %s", log_id)
     return MessageResponse(
         message="Body log deleted successfully.",
-        detail=f"Deleted log ID {log_id} from {log.date}."
+        detail=f"Deleted log ID {log_id} from {log_date}."
     )
 
 
 # ----- Helper Functions -----
 
-def _has_all_skinfolds(log: BodyLogCreate) -> bool:
-    """
-    Check if a BodyLogCreate schema has all 7 skinfold measurements.
-    Returns True only if ALL 7 sites have non-None values.
-    """
-    return all([
-        log.skinfold_chest is not None,
-        log.skinfold_axillary is not None,
-        log.skinfold_triceps is not None,
-        log.skinfold_subscapular is not None,
-        log.skinfold_suprailiac is not None,
-        log.skinfold_abdominal is not None,
-        log.skinfold_thigh is not None,
-    ])
-
-
-def _log_has_all_skinfolds(log: BodyLog) -> bool:
-    """
-    Check if a BodyLog ORM model has all 7 skinfold measurements.
-    Returns True only if ALL 7 sites have non-None values.
-    """
-    return all([
-        log.skinfold_chest is not None,
-        log.skinfold_axillary is not None,
-        log.skinfold_triceps is not None,
-        log.skinfold_subscapular is not None,
-        log.skinfold_suprailiac is not None,
-        log.skinfold_abdominal is not None,
-        log.skinfold_thigh is not None,
-    ])
+def _duplicate_date_error(log_date: date) -> HTTPException:
+    """Build the 409 returned when a user already has a log for `log_date`."""
+    return HTTPException(
+        status_code=409,
+        detail=f"A body log for {log_date} already exists. Update it instead."
+    )
+
@@ -11,10 +11,9 @@ Endpoints:
 
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, HTTPException
 
-from app.core.database import get_db
+from app.core.database import DB
 from app.schemas import (
     ApplySuggestionRequest,
     DietPlanResponse,
@@ -33,7 +32,7 @@ router = APIRouter(prefix="/coach", tags=["Bulking Coach"])
 @router.post("/check-stagnation", response_model=StagnationResult)
 async def check_stagnation_endpoint(
     request: StagnationCheckRequest,
-    db: AsyncSession = Depends(get_db),
+    db: DB,
 ):
     """
     Run the Floating Anchor weight analysis with Calories-First strategy.
@@ -69,7 +68,7 @@ async def check_stagnation_endpoint(
 @router.post("/apply-suggestion", response_model=DietPlanResponse)
 async def apply_suggestion_endpoint(
     request: ApplySuggestionRequest,
-    db: AsyncSession = Depends(get_db),
+    db: DB,
 ):
     """
     Apply a coach suggestion to the active diet plan.
@@ -101,7 +100,7 @@ async def apply_suggestion_endpoint(
 @router.post("/dismiss-suggestion", response_model=MessageResponse)
 async def dismiss_suggestion_endpoint(
     request: DismissSuggestionRequest,
-    db: AsyncSession = Depends(get_db),
+    db: DB,
 ):
     """
     Dismiss a coach suggestion without changing diet targets.
@@ -10,32 +10,32 @@ Endpoints:
 
 import logging
 from datetime import date, timedelta
-from typing import Optional
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import select
+from fastapi import APIRouter, Query
+from sqlalchemy import Float, cast, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
-from app.core.database import get_db
-from app.models import BodyLog, DietPlan, Meal, MealItem
+from app.core.database import DB
+from app.models import BodyLog
 from app.schemas import BodyLogResponse, DashboardStats
-from app.services.body_fat import calculate_body_fat_from_skinfolds
-from app.services.diet_calculator import get_current_diet_full
+from app.services.diet_calculator import get_current_plan_totals
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
+# Rows fetched per round trip when streaming the history (days can be up to 365)
+HISTORY_PARTITION_SIZE = 100
+
 
 @router.get("/stats", response_model=DashboardStats)
 async def get_dashboard_stats(
+    db: DB,
     user_id: str = Query(default="default_user", description="User identifier"),
     days: int = Query(
         default=30, ge=7, le=365,
         description="Number of days of history to include"
     ),
-    db: AsyncSession = Depends(get_db),
 ):
     """
     Get aggregated dashboard statistics for charting and overview.
@@ -51,105 +51,103 @@ async def get_dashboard_stats(
     """
     start_date = date.today() - timedelta(days=days)
 
-    # ----- 1. Fetch weight and body fat history -----
-    stmt = (
+    # All queries run in turn on the request session, so a dashboard request
+    # holds a single pool connection like every other endpoint
+    weight_history, body_fat_history, latest_log = await _fetch_body_logs(db, user_id, start_date)
+    plan_summary = await _fetch_plan_summary(db, user_id)
+
+    return DashboardStats(
+        weight_history=weight_history,
+        body_fat_history=body_fat_history,
+        current_plan_summary=plan_summary,
+        latest_body_log=latest_log,
+    )
+
+
+async def _fetch_body_logs(
+    db: AsyncSession,
+    user_id: str,
+    start_date: date,
+) -> tuple[list[dict], list[dict], BodyLogResponse | None]:
+    """
+    The weight and body fat history arrays plus the latest body log.
+
+    The history is streamed in date order, so its last row is the latest log;
+    only that one row is then loaded in full (its stored body fat fields come
+    along). With no logs in the window, no further query runs.
+    """
+    weight_history, body_fat_history, latest_date = await _fetch_history(db, user_id, start_date)
+    if latest_date is None:
+        return weight_history, body_fat_history, None
+
+    last_log = await db.scalar(
         select(BodyLog)
         .where(BodyLog.user_id == user_id)
+        .where(BodyLog.date == latest_date)
+    )
+    return weight_history, body_fat_history, BodyLogResponse.model_validate(last_log)
+
+
+async def _fetch_history(
+    db: AsyncSession,
+    user_id: str,
+    start_date: date,
+) -> tuple[list[dict], list[dict], date | None]:
+    """
+    Build the weight and body fat history arrays, plus the date of the last row.
+
+    Body fat is resolved in SQL — bioimpedance value first, else the stored
+    Pollock/Siri result from the skinfolds — so only 3 columns come back.
+    Rows are streamed in partitions and turned into the chart points in a
+    single pass, so the full result set is never held in memory.
+    """
+    body_fat_percent = func.coalesce(
+        cast(BodyLog.bio_body_fat_percent, Float),
+        BodyLog.calculated_body_fat_percent,
+    ).label("body_fat_percent")
+    stmt = (
+        select(BodyLog.date, BodyLog.weight_kg, body_fat_percent)
+        .where(BodyLog.user_id == user_id)
         .where(BodyLog.date >= start_date)
         .order_by(BodyLog.date.asc())
+        .execution_options(yield_per=HISTORY_PARTITION_SIZE)
     )
-    result = await db.execute(stmt)
-    logs = result.scalars().all()
 
-    # Build weight history array for charts
-    weight_history = [
-        {"date": log.date.isoformat(), "weight_kg": log.weight_kg}
-        for log in logs
-    ]
-
-    # Build body fat history array
-    # Priority: bioimpedance value > calculated from skinfolds
+    weight_history = []
     body_fat_history = []
-    for log in logs:
-        fat_percent = None
-
-        # First, check if we have a bioimpedance reading
-        if log.bio_body_fat_percent is not None:
-            fat_percent = log.bio_body_fat_percent
-
-        # If not, try to calculate from skinfolds
-        elif _log_has_all_skinfolds(log):
-            bf_result = calculate_body_fat_from_skinfolds(
-                chest=log.skinfold_chest,
-                axillary=log.skinfold_axillary,
-                triceps=log.skinfold_triceps,
-                subscapular=log.skinfold_subscapular,
-                suprailiac=log.skinfold_suprailiac,
-                abdominal=log.skinfold_abdominal,
-                thigh=log.skinfold_thigh,
-            )
-            fat_percent = bf_result["body_fat_percent"]
-
-        if fat_percent is not None:
-            body_fat_history.append({
-                "date": log.date.isoformat(),
-                "body_fat_percent": fat_percent,
-            })
-
-    # ----- 2. Get current diet plan summary -----
-    plan_summary = None
-    try:
-        plan_data = await get_current_diet_full(db, user_id)
-        plan_summary = {
-            "target_calories": plan_data["calories_comparison"]["target"],
-            "actual_calories": plan_data["calories_comparison"]["actual"],
-            "target_protein": plan_data["protein_comparison"]["target"],
-            "actual_protein": plan_data["protein_comparison"]["actual"],
-            "target_carbs": plan_data["carbs_comparison"]["target"],
-            "actual_carbs": plan_data["carbs_comparison"]["actual"],
-            "target_fat": plan_data["fat_comparison"]["target"],
-            "actual_fat": plan_data["fat_comparison"]["actual"],
-        }
-    except ValueError:
-        # No active plan — that's okay, just return None
-        plan_summary = None
-
-    # ----- 3. Get the latest body log -----
-    latest_log = None
-    if logs:
-        last_log = logs[-1]  # Already sorted ascending, so last = most recent
-        latest_log = BodyLogResponse.model_validate(last_log)
-
-        # Calculate body fat for the latest log if possible
-        if _log_has_all_skinfolds(last_log):
-            bf_result = calculate_body_fat_from_skinfolds(
-                chest=last_log.skinfold_chest,
-                axillary=last_log.skinfold_axillary,
-                triceps=last_log.skinfold_triceps,
-                subscapular=last_log.skinfold_subscapular,
-                suprailiac=last_log.skinfold_suprailiac,
-                abdominal=last_log.skinfold_abdominal,
-                thigh=last_log.skinfold_thigh,
-            )
-            latest_log.calculated_body_density = bf_result["body_density"]
-            latest_log.calculated_body_fat_percent = bf_result["body_fat_percent"]
+    log_date = None
+    result = await db.stream(stmt)
+    async for partition in result.partitions():
+        for log_date, weight_kg, fat_percent in partition:
+            iso_date = log_date.isoformat()
+            weight_history.append({"date": iso_date, "weight_kg": weight_kg})
+            # Days without any body fat value are skipped
+            if fat_percent is not None:
+                body_fat_history.append({"date": iso_date, "body_fat_percent": fat_percent})
 
-    return DashboardStats(
-        weight_history=weight_history,
-        body_fat_history=body_fat_history,
-        current_plan_summary=plan_summary,
-        latest_body_log=latest_log,
-    )
+    return weight_history, body_fat_history, log_date
 
 
-def _log_has_all_skinfolds(log: BodyLog) -> bool:
-    """Check if a BodyLog has all 7 skinfold measurements for Pollock calculation."""
-    return all([
-        log.skinfold_chest is not None,
-        log.skinfold_axillary is not None,
-        log.skinfold_triceps is not None,
-        log.skinfold_subscapular is not None,
-        log.skinfold_suprailiac is not None,
-        log.skinfold_abdominal is not None,
-        log.skinfold_thigh is not None,
-    ])
+async def _fetch_plan_summary(db: AsyncSession, user_id: str) -> dict | None:
+    """
+    Target vs actual macros for the active plan, or None if there is none.
+
+    Only the totals are needed, so they are aggregated in SQL instead of
+    loading the full plan tree.
+    """
+    try:
+        totals = await get_current_plan_totals(db, user_id)
+    except ValueError:
+        # No active plan — that's okay, just return None
+        return None
+
+    return {
+        "target_calories": totals["target_calories"],
+        "actual_calories": totals["total_calories"],
+        "target_protein": totals["target_protein"],
+        "actual_protein": totals["total_protein"],
+        "target_carbs": totals["target_carbs"],
+        "actual_carbs": totals["total_carbs"],
+        "target_fat": totals["target_fat"],
+        "actual_fat": totals["total_fat"],
+    }
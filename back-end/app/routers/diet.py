@@ -23,14 +23,20 @@ Endpoints:
 
 import io
 import logging
-
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import StreamingResponse
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-
-from app.core.database import get_db
+from functools import lru_cache
+from types import SimpleNamespace
+
+import orjson
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from sqlalchemy import Boolean, Float, Integer, bindparam, delete, func, literal, literal_column, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import update as sa_update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import aliased, raiseload, selectinload
+
+from app.core.database import DB, violated_constraint
 from app.models import DietPlan, DietVariation, FoodItem, Meal, MealItem
 from app.schemas import (
     DietPlanCreate,
@@ -48,17 +54,65 @@ from app.schemas import (
     MealResponse,
     MessageResponse,
 )
-from app.services.diet_calculator import get_current_diet_full
+from app.services.diet_calculator import (
+    MEAL_ITEM_MACRO_COLUMNS,
+    build_meal_data,
+    build_variation_data,
+    cache_current_diet,
+    cache_export,
+    cache_generation,
+    first_variation_id_subquery,
+    get_cached_current_diet,
+    get_cached_export,
+    get_current_diet_full,
+    invalidate_current_diet,
+    meal_item_macros_sql,
+)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/diet", tags=["Diet Plans"])
 
+# Stored macro columns returned by the meal item write endpoints
+_STORED_MACRO_COLUMNS = tuple(
+    MealItem.__table__.c[name] for name in MEAL_ITEM_MACRO_COLUMNS
+)
+
+# Read statements built once at import time; each request only binds the ID
+# (see the note in app.services.diet_calculator).
+# Every eager-loading statement in this module ends with raiseload("*"): a
+# relationship that was not loaded explicitly raises instead of silently
+# issuing one lazy SELECT per row.
+_SIBLING_VARIATION = aliased(DietVariation)
+_VARIATION_DELETE_CHECK_STMT = (
+    select(
+        DietVariation.name,
+        DietPlan.user_id,
+        select(func.count())
+        .select_from(_SIBLING_VARIATION)
+        .where(_SIBLING_VARIATION.diet_plan_id == DietVariation.diet_plan_id)
+        .scalar_subquery()
+        .label("variation_count"),
+    )
+    .join(DietPlan, DietPlan.id == DietVariation.diet_plan_id)
+    .where(DietVariation.id == bindparam("variation_id"))
+)
+_DELETE_VARIATION_STMT = delete(DietVariation).where(
+    DietVariation.id == bindparam("variation_id")
+)
+_VARIATION_EXISTS_STMT = select(DietVariation.id).where(
+    DietVariation.id == bindparam("variation_id")
+)
+_MEAL_EXISTS_STMT = select(Meal.id).where(Meal.id == bindparam("meal_id"))
+_PLAN_FIRST_VARIATION_STMT = select(
+    DietPlan.id, first_variation_id_subquery.label("first_variation_id")
+).where(DietPlan.id == bindparam("plan_id"))
+
 
 @router.post("/plans", response_model=DietPlanResponse, status_code=201)
 async def create_diet_plan(
     plan: DietPlanCreate,
-    db: AsyncSession = Depends(get_db),
+    db: DB,
 ):
     """
     Create a new diet plan with daily macro targets.
@@ -75,23 +129,34 @@ async def create_diet_plan(
     }
     """
     # If the new plan should be active, deactivate all other plans for this user
+    # with one bulk UPDATE (no rows are loaded into the session)
     if plan.is_active:
-        stmt = (
-            select(DietPlan)
+        result = await db.execute(
+            sa_update(DietPlan)
             .where(DietPlan.user_id == plan.user_id)
             .where(DietPlan.is_active == True)
+            .values(is_active=False)
+            .execution_options(synchronize_session=False)
         )
-        result = await db.execute(stmt)
-        existing_active_plans = result.scalars().all()
-
-        for existing_plan in existing_active_plans:
-            existing_plan.is_active = False
-            logger.info(f"Deactivated plan ID {existing_plan.id} for user '{plan.user_id}'")
+        if result.rowcount:
+            logger.info(
+                "Deactivated %s active plan(s) for user '%s'",
+                result.rowcount, plan.user_id,
+            )
 
     # Create the new plan
     db_plan = DietPlan(**plan.model_dump())
     db.add(db_plan)
-    await db.flush()  # Get the plan ID
+    try:
+        await db.flush()  # Get the plan ID
+    except IntegrityError:
+        # uq_diet_plans_active_user: another active plan was created for this
+        # user concurrently, after the deactivation above
+        await db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail="Another active diet plan was just created for this user. Try again."
+        )
 
     # Automatically create a default "Principal" variation
     default_variation = DietVariation(
@@ -102,19 +167,19 @@ async def create_diet_plan(
     db.add(default_variation)
 
     await db.commit()
-    await db.refresh(db_plan)
+    invalidate_current_diet()
 
     logger.info(
-        f"Created diet plan ID {db_plan.id} for user '{db_plan.user_id}' "
-        f"(calories={db_plan.target_calories}, protein={db_plan.target_protein}g)"
+        "Created diet plan ID %s for user '%s' (calories=%s, protein=%sg)",
+        db_plan.id, db_plan.user_id, db_plan.target_calories, db_plan.target_protein,
     )
     return db_plan
 
 
 @router.get("/current", response_model=DietPlanFullResponse)
 async def get_current_diet(
+    db: DB,
     user_id: str = "default_user",
-    db: AsyncSession = Depends(get_db),
 ):
     """
     Get the complete current (active) diet plan with full hierarchy.
@@ -129,11 +194,24 @@ async def get_current_diet(
     
     This is the primary endpoint for the diet overview dashboard.
     """
-    try:
-        plan_data = await get_current_diet_full(db, user_id)
-        return plan_data
-    except ValueError as e:
-        raise HTTPException(status_code=404, detail=str(e))
+    body = get_cached_current_diet(user_id)
+    if body is None:
+        # Taken before the read so a write committed meanwhile keeps this
+        # (possibly stale) body out of the cache
+        generation = cache_generation()
+        try:
+            plan_data = await get_current_diet_full(db, user_id)
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+
+        # Serialize once; cache hits return these bytes without touching
+        # the database or pydantic
+        body = orjson.dumps(
+            DietPlanFullResponse.model_validate(plan_data).model_dump(mode="json")
+        )
+        cache_current_diet(user_id, body, generation)
+
+    return Response(content=body, media_type="application/json")
 
 
 # ============================================================
@@ -144,8 +222,8 @@ async def get_current_diet(
 async def create_variation(
     plan_id: int,
     variation: DietVariationCreate,
+    db: DB,
     duplicate_from: int | None = None,
-    db: AsyncSession = Depends(get_db),
 ):
     """
     Create a new variation for a diet plan.
@@ -163,25 +241,14 @@ async def create_variation(
       { "name": "Substituição (cópia)", "order_index": 1 }
     """
     # Verify the plan exists
-    stmt = select(DietPlan).where(DietPlan.id == plan_id)
-    result = await db.execute(stmt)
-    plan = result.scalar_one_or_none()
+    plan = await db.get(DietPlan, plan_id)
 
     if not plan:
         raise HTTPException(status_code=404, detail=f"Diet plan with ID {plan_id} not found.")
 
-    # Create the variation
-    db_variation = DietVariation(
-        diet_plan_id=plan_id,
-        name=variation.name,
-        order_index=variation.order_index,
-    )
-    db.add(db_variation)
-    await db.flush()  # Get the ID without committing
-
-    meals_data: list[dict] = []
+    source_variation = None
 
-    # If duplicating from an existing variation
+    # If duplicating from an existing variation, load it before writing anything
     if duplicate_from is not None:
         source_stmt = (
             select(DietVariation)
@@ -190,7 +257,9 @@ async def create_variation(
             .options(
                 selectinload(DietVariation.meals)
                 .selectinload(Meal.items)
-                .selectinload(MealItem.food_item)
+                .joinedload(MealItem.food_item, innerjoin=True)
+                .load_only(FoodItem.name),
+                raiseload("*"),
             )
         )
         source_result = await db.execute(source_stmt)
@@ -202,67 +271,83 @@ async def create_variation(
                 detail=f"Source variation with ID {duplicate_from} not found in plan {plan_id}."
             )
 
-        # Copy meals and items
-        for source_meal in source_variation.meals:
-            new_meal = Meal(
-                diet_plan_id=plan_id,
-                variation_id=db_variation.id,
-                name=source_meal.name,
-                order_index=source_meal.order_index,
-            )
-            db.add(new_meal)
-            await db.flush()
-
-            items_data = []
-            meal_total_cal = meal_total_pro = meal_total_carb = meal_total_fat = 0.0
-
-            for source_item in source_meal.items:
-                new_item = MealItem(
-                    meal_id=new_meal.id,
+    # Copy meals and items. The new rows are linked through relationships
+    # instead of foreign-key values, so no flush is needed to learn IDs: the
+    # commit writes the variation, all meals and all items in a single flush,
+    # with one batched INSERT ... RETURNING per table.
+    # The stored macros depend only on food and quantity, so they are
+    # copied along with them.
+    source_meals = source_variation.meals if source_variation else []
+    new_meals = [
+        Meal(
+            name=source_meal.name,
+            order_index=source_meal.order_index,
+            items=[
+                MealItem(
                     food_item_id=source_item.food_item_id,
                     quantity_grams=source_item.quantity_grams,
+                    calculated_calories=source_item.calculated_calories,
+                    calculated_protein=source_item.calculated_protein,
+                    calculated_carbs=source_item.calculated_carbs,
+                    calculated_fat=source_item.calculated_fat,
                 )
-                db.add(new_item)
-                await db.flush()
-
-                qty_factor = source_item.quantity_grams / 100
-                cal = round(qty_factor * source_item.food_item.calories_kcal, 2)
-                pro = round(qty_factor * source_item.food_item.protein_g, 2)
-                carb = round(qty_factor * source_item.food_item.carbs_g, 2)
-                fat = round(qty_factor * source_item.food_item.fat_g, 2)
-
-                meal_total_cal += cal
-                meal_total_pro += pro
-                meal_total_carb += carb
-                meal_total_fat += fat
-
-                items_data.append(MealItemResponse(
-                    id=new_item.id,
-                    food_item_id=source_item.food_item_id,
-                    food_item_name=source_item.food_item.name,
-                    quantity_grams=source_item.quantity_grams,
-                    calculated_calories=cal,
-                    calculated_protein=pro,
-                    calculated_carbs=carb,
-                    calculated_fat=fat,
-                ))
-
-            meals_data.append({
-                "id": new_meal.id,
-                "name": new_meal.name,
-                "order_index": new_meal.order_index,
-                "items": items_data,
-                "total_calories": round(meal_total_cal, 2),
-                "total_protein": round(meal_total_pro, 2),
-                "total_carbs": round(meal_total_carb, 2),
-                "total_fat": round(meal_total_fat, 2),
-            })
+                for source_item in source_meal.items
+            ],
+        )
+        for source_meal in source_meals
+    ]
 
+    # Create the variation
+    db_variation = DietVariation(
+        diet_plan_id=plan_id,
+        name=variation.name,
+        order_index=variation.order_index,
+        meals=new_meals,
+    )
+    db.add(db_variation)
     await db.commit()
-    await db.refresh(db_variation)
+    invalidate_current_diet()
 
-    logger.info(f"Created variation '{db_variation.name}' for plan ID {plan_id}"
-                f"{' (duplicated from ' + str(duplicate_from) + ')' if duplicate_from else ''}")
+    meals_data: list[dict] = []
+    for source_meal, new_meal in zip(source_meals, new_meals):
+        items_data = []
+        meal_total_cal = meal_total_pro = meal_total_carb = meal_total_fat = 0.0
+
+        for source_item, new_item in zip(source_meal.items, new_meal.items):
+            meal_total_cal += new_item.calculated_calories
+            meal_total_pro += new_item.calculated_protein
+            meal_total_carb += new_item.calculated_carbs
+            meal_total_fat += new_item.calculated_fat
+
+            items_data.append(MealItemResponse.model_construct(
+                id=new_item.id,
+                food_item_id=new_item.food_item_id,
+                food_item_name=source_item.food_item.name,
+                quantity_grams=new_item.quantity_grams,
+                calculated_calories=new_item.calculated_calories,
+                calculated_protein=new_item.calculated_protein,
+                calculated_carbs=new_item.calculated_carbs,
+                calculated_fat=new_item.calculated_fat,
+            ))
+
+        meals_data.append({
+            "id": new_meal.id,
+            "name": new_meal.name,
+            "order_index": new_meal.order_index,
+            "items": items_data,
+            "total_calories": round(meal_total_cal, 2),
+            "total_protein": round(meal_total_pro, 2),
+            "total_carbs": round(meal_total_carb, 2),
+            "total_fat": round(meal_total_fat, 2),
+        })
+
+    if duplicate_from:
+        logger.info(
+            "Created variation '%s' for plan ID %s (duplicated from %s)",
+            db_variation.name, plan_id, duplicate_from,
+        )
+    else:
+        logger.info("Created variation '%s' for plan ID %s", db_variation.name, plan_id)
 
     # Build response
     variation_total_cal = sum(m.get("total_calories", 0) for m in meals_data)
@@ -270,93 +355,103 @@ async def create_variation(
     variation_total_carb = sum(m.get("total_carbs", 0) for m in meals_data)
     variation_total_fat = sum(m.get("total_fat", 0) for m in meals_data)
 
-    return DietVariationResponse(
+    # Every value comes from the rows just written, so validation is skipped
+    response = DietVariationResponse.model_construct(
         id=db_variation.id,
         name=db_variation.name,
         order_index=db_variation.order_index,
         created_at=db_variation.created_at,
-        meals=[MealResponse(**m) if isinstance(m, dict) else m for m in meals_data],
+        meals=[MealResponse.model_construct(**m) for m in meals_data],
         total_calories=round(variation_total_cal, 2),
         total_protein=round(variation_total_pro, 2),
         total_carbs=round(variation_total_carb, 2),
         total_fat=round(variation_total_fat, 2),
     )
+    return _json_response(response, status_code=201)
 
 
 @router.patch("/variations/{variation_id}", response_model=DietVariationResponse)
 async def rename_variation(
     variation_id: int,
     payload: DietVariationRename,
+    db: DB,
     user_id: str = "default_user",
-    db: AsyncSession = Depends(get_db),
 ):
     """Rename an existing variation."""
+    # Rename only if the variation belongs to one of this user's plans; the
+    # ownership check is part of the UPDATE's WHERE clause. RETURNING gives
+    # back the variation, with its meals and items loaded for the totals.
     stmt = (
-        select(DietVariation)
+        sa_update(DietVariation)
         .where(DietVariation.id == variation_id)
+        .where(DietVariation.diet_plan_id == DietPlan.id)
+        .where(DietPlan.user_id == user_id)
+        .values(name=payload.name)
+        .returning(DietVariation)
         .options(
-            selectinload(DietVariation.diet_plan),
             selectinload(DietVariation.meals)
             .selectinload(Meal.items)
-            .selectinload(MealItem.food_item),
+            .joinedload(MealItem.food_item, innerjoin=True)
+            .load_only(FoodItem.name),
+            raiseload("*"),
         )
+        .execution_options(synchronize_session=False)
     )
-    result = await db.execute(stmt)
-    variation = result.scalar_one_or_none()
+    variation = await db.scalar(stmt)
 
     if not variation:
-        raise HTTPException(status_code=404, detail=f"Variation with ID {variation_id} not found.")
-
-    if variation.diet_plan.user_id != user_id:
+        # Nothing was updated: tell a missing variation apart from someone else's
+        variation_exists = await db.scalar(
+            _VARIATION_EXISTS_STMT, {"variation_id": variation_id}
+        )
+        if variation_exists is None:
+            raise HTTPException(status_code=404, detail=f"Variation with ID {variation_id} not found.")
         raise HTTPException(status_code=403, detail="This variation does not belong to your diet plan.")
 
-    old_name = variation.name
-    variation.name = payload.name
     await db.commit()
-    await db.refresh(variation)
+    invalidate_current_diet()
 
-    logger.info(f"Renamed variation ID {variation_id} from '{old_name}' to '{payload.name}'")
+    logger.info("Renamed variation ID %s to '%s'", variation_id, payload.name)
 
     # Build response with calculated totals
-    from app.services.diet_calculator import _build_variation_data
-    var_data = _build_variation_data(variation)
+    var_data = build_variation_data(variation)
 
-    return DietVariationResponse(**var_data)
+    var_data["meals"] = [_meal_response(m) for m in var_data["meals"]]
+    return _json_response(DietVariationResponse.model_construct(**var_data))
 
 
 @router.delete("/variations/{variation_id}", response_model=MessageResponse)
 async def delete_variation(
     variation_id: int,
+    db: DB,
     user_id: str = "default_user",
-    db: AsyncSession = Depends(get_db),
 ):
     """Delete a variation and all its meals/items. Cannot delete the last variation."""
-    stmt = (
-        select(DietVariation)
-        .where(DietVariation.id == variation_id)
-        .options(selectinload(DietVariation.diet_plan).selectinload(DietPlan.variations))
-    )
-    result = await db.execute(stmt)
-    variation = result.scalar_one_or_none()
+    # One row with the name, the owner and the plan's variation count; no
+    # ORM objects are loaded
+    params = {"variation_id": variation_id}
+    variation = (await db.execute(_VARIATION_DELETE_CHECK_STMT, params)).one_or_none()
 
     if not variation:
         raise HTTPException(status_code=404, detail=f"Variation with ID {variation_id} not found.")
 
-    if variation.diet_plan.user_id != user_id:
+    if variation.user_id != user_id:
         raise HTTPException(status_code=403, detail="This variation does not belong to your diet plan.")
 
     # Don't allow deleting the last variation
-    if len(variation.diet_plan.variations) <= 1:
+    if variation.variation_count <= 1:
         raise HTTPException(
             status_code=400,
             detail="Cannot delete the only remaining variation. A plan must have at least one variation."
         )
 
     var_name = variation.name
-    await db.delete(variation)
+    # ON DELETE CASCADE removes the variation's meals and items
+    await db.execute(_DELETE_VARIATION_STMT, params)
     await db.commit()
+    invalidate_current_diet()
 
-    logger.info(f"Deleted variation '{var_name}' (ID {variation_id}) and all its meals")
+    logger.info("Deleted variation '%s' (ID %s) and all its meals", var_name, variation_id)
 
     return MessageResponse(
         message="Variação excluída com sucesso.",
@@ -368,44 +463,28 @@ async def delete_variation(
 async def add_meal_to_variation(
     variation_id: int,
     meal: MealCreate,
-    db: AsyncSession = Depends(get_db),
+    db: DB,
 ):
     """
     Add a new meal to a specific variation.
     """
-    stmt = (
-        select(DietVariation)
-        .where(DietVariation.id == variation_id)
-        .options(selectinload(DietVariation.meals))
-    )
-    result = await db.execute(stmt)
-    variation = result.scalar_one_or_none()
+    variation = await db.get(DietVariation, variation_id)
 
     if not variation:
         raise HTTPException(status_code=404, detail=f"Variation with ID {variation_id} not found.")
 
     db_meal = Meal(
-        diet_plan_id=variation.diet_plan_id,
         variation_id=variation_id,
         name=meal.name,
         order_index=meal.order_index,
     )
     db.add(db_meal)
     await db.commit()
-    await db.refresh(db_meal)
+    invalidate_current_diet()
 
-    logger.info(f"Added meal '{db_meal.name}' to variation ID {variation_id}")
+    logger.info("Added meal '%s' to variation ID %s", db_meal.name, variation_id)
 
-    return MealResponse(
-        id=db_meal.id,
-        name=db_meal.name,
-        order_index=db_meal.order_index,
-        items=[],
-        total_calories=0.0,
-        total_protein=0.0,
-        total_carbs=0.0,
-        total_fat=0.0,
-    )
+    return _empty_meal_response(db_meal)
 
 
 # ============================================================
@@ -416,7 +495,7 @@ async def add_meal_to_variation(
 async def add_meal_to_plan(
     plan_id: int,
     meal: MealCreate,
-    db: AsyncSession = Depends(get_db),
+    db: DB,
 ):
     """
     Add a new meal to an existing diet plan.
@@ -425,173 +504,136 @@ async def add_meal_to_plan(
     Meals represent eating occasions during the day (e.g., "Breakfast",
     "Post-workout shake", "Dinner"). The order_index controls display order.
     """
-    # Verify the plan exists with its variations
-    stmt = (
-        select(DietPlan)
-        .where(DietPlan.id == plan_id)
-        .options(selectinload(DietPlan.variations))
-    )
-    result = await db.execute(stmt)
-    plan = result.scalar_one_or_none()
+    # Verify the plan exists and find its first variation in one query
+    row = (
+        await db.execute(_PLAN_FIRST_VARIATION_STMT, {"plan_id": plan_id})
+    ).one_or_none()
 
-    if not plan:
+    if not row:
         raise HTTPException(
             status_code=404,
             detail=f"Diet plan with ID {plan_id} not found."
         )
 
-    # Get the first variation (or None)
-    variation_id = None
-    if plan.variations:
-        first_variation = sorted(plan.variations, key=lambda v: v.order_index)[0]
-        variation_id = first_variation.id
-
-    # Create the meal
-    db_meal = Meal(
-        diet_plan_id=plan_id,
-        variation_id=variation_id,
-        name=meal.name,
-        order_index=meal.order_index,
-    )
+    # Create the meal in the first variation
+    db_meal = Meal(name=meal.name, order_index=meal.order_index)
+    if row.first_variation_id is not None:
+        db_meal.variation_id = row.first_variation_id
+    else:
+        # The plan has no variation yet: create the default one with the
+        # meal, so a single flush writes both
+        db_meal.variation = DietVariation(diet_plan_id=plan_id, name="Principal", order_index=0)
     db.add(db_meal)
     await db.commit()
-    await db.refresh(db_meal)
+    invalidate_current_diet()
 
-    logger.info(f"Added meal '{db_meal.name}' to plan ID {plan_id}")
+    logger.info("Added meal '%s' to plan ID %s", db_meal.name, plan_id)
 
-    return MealResponse(
-        id=db_meal.id,
-        name=db_meal.name,
-        order_index=db_meal.order_index,
-        items=[],
-        total_calories=0.0,
-        total_protein=0.0,
-        total_carbs=0.0,
-        total_fat=0.0,
-    )
+    return _empty_meal_response(db_meal)
 
 
 @router.patch("/meals/{meal_id}", response_model=MealResponse)
 async def rename_meal(
     meal_id: int,
     payload: MealRename,
+    db: DB,
     user_id: str = "default_user",
-    db: AsyncSession = Depends(get_db),
 ):
     """
     Rename an existing meal within the user's active diet plan.
 
-    Verifies that the meal belongs to the authenticated user's active plan
-    before applying the update.
+    Only applies the update if the meal belongs to the authenticated user's
+    active plan.
 
     Example:
       PATCH /diet/meals/3
       { "name": "Post-workout Shake" }
     """
-    # Fetch the meal with its parent plan loaded
+    # Rename only if the meal belongs to this user's active plan (through its
+    # variation); the ownership check is part of the UPDATE's WHERE clause.
+    # RETURNING gives back the meal, with its items loaded for the totals.
     stmt = (
-        select(Meal)
+        sa_update(Meal)
         .where(Meal.id == meal_id)
-        .options(selectinload(Meal.diet_plan), selectinload(Meal.items).selectinload(MealItem.food_item))
+        .where(Meal.variation_id == DietVariation.id)
+        .where(DietVariation.diet_plan_id == DietPlan.id)
+        .where(DietPlan.user_id == user_id)
+        .where(DietPlan.is_active == True)
+        .values(name=payload.name)
+        .returning(Meal)
+        .options(
+            selectinload(Meal.items)
+            .joinedload(MealItem.food_item, innerjoin=True)
+            .load_only(FoodItem.name),
+            raiseload("*"),
+        )
+        .execution_options(synchronize_session=False)
     )
-    result = await db.execute(stmt)
-    meal = result.scalar_one_or_none()
+    meal = await db.scalar(stmt)
 
     if not meal:
-        raise HTTPException(status_code=404, detail=f"Meal with ID {meal_id} not found.")
-
-    # Verify ownership: meal must belong to this user's active plan
-    if meal.diet_plan.user_id != user_id or not meal.diet_plan.is_active:
+        # Nothing was updated: tell a missing meal apart from someone else's
+        meal_exists = await db.scalar(_MEAL_EXISTS_STMT, {"meal_id": meal_id})
+        if meal_exists is None:
+            raise HTTPException(status_code=404, detail=f"Meal with ID {meal_id} not found.")
         raise HTTPException(
             status_code=403,
             detail="This meal does not belong to your active diet plan."
         )
 
-    old_name = meal.name
-    meal.name = payload.name
     await db.commit()
-    await db.refresh(meal)
-
-    logger.info(f"Renamed meal ID {meal_id} from '{old_name}' to '{payload.name}'")
-
-    # Build response with totals
-    items_response = []
-    total_cal = total_prot = total_carbs = total_fat = 0.0
-    for item in meal.items:
-        qty_factor = item.quantity_grams / 100
-        cal = round(qty_factor * item.food_item.calories_kcal, 2)
-        prot = round(qty_factor * item.food_item.protein_g, 2)
-        carbs = round(qty_factor * item.food_item.carbs_g, 2)
-        fat = round(qty_factor * item.food_item.fat_g, 2)
-        total_cal += cal
-        total_prot += prot
-        total_carbs += carbs
-        total_fat += fat
-        items_response.append(MealItemResponse(
-            id=item.id,
-            food_item_id=item.food_item.id,
-            food_item_name=item.food_item.name,
-            quantity_grams=item.quantity_grams,
-            calculated_calories=cal,
-            calculated_protein=prot,
-            calculated_carbs=carbs,
-            calculated_fat=fat,
-        ))
-
-    return MealResponse(
-        id=meal.id,
-        name=meal.name,
-        order_index=meal.order_index,
-        items=items_response,
-        total_calories=round(total_cal, 2),
-        total_protein=round(total_prot, 2),
-        total_carbs=round(total_carbs, 2),
-        total_fat=round(total_fat, 2),
-    )
+    invalidate_current_diet()
+
+    logger.info("Renamed meal ID %s to '%s'", meal_id, payload.name)
+
+    return _json_response(_meal_response(build_meal_data(meal)))
 
 
 @router.delete("/meals/{meal_id}", response_model=MessageResponse)
 async def delete_meal(
     meal_id: int,
+    db: DB,
     user_id: str = "default_user",
-    db: AsyncSession = Depends(get_db),
 ):
     """
     Delete a meal and all its associated meal items (cascade).
 
-    Verifies that the meal belongs to the authenticated user's active plan
-    before deleting.
+    Only deletes the meal if it belongs to the authenticated user's active
+    plan.
 
-    The SQLAlchemy relationship cascade="all, delete-orphan" on Meal.items
-    ensures all MealItems are automatically removed.
+    The ON DELETE CASCADE foreign key on meal_items.meal_id removes all
+    MealItems in the database.
 
     Example:
       DELETE /diet/meals/3?user_id=default_user
     """
-    # Fetch the meal with its parent plan loaded
+    # Delete only if the meal belongs to this user's active plan (through its
+    # variation); the ownership check is part of the DELETE's WHERE clause
     stmt = (
-        select(Meal)
+        delete(Meal)
         .where(Meal.id == meal_id)
-        .options(selectinload(Meal.diet_plan))
+        .where(Meal.variation_id == DietVariation.id)
+        .where(DietVariation.diet_plan_id == DietPlan.id)
+        .where(DietPlan.user_id == user_id)
+        .where(DietPlan.is_active == True)
+        .returning(Meal.name)
     )
-    result = await db.execute(stmt)
-    meal = result.scalar_one_or_none()
-
-    if not meal:
-        raise HTTPException(status_code=404, detail=f"Meal with ID {meal_id} not found.")
+    meal_name = await db.scalar(stmt)
 
-    # Verify ownership: meal must belong to this user's active plan
-    if meal.diet_plan.user_id != user_id or not meal.diet_plan.is_active:
+    if meal_name is None:
+        # Nothing was deleted: tell a missing meal apart from someone else's
+        meal_exists = await db.scalar(_MEAL_EXISTS_STMT, {"meal_id": meal_id})
+        if meal_exists is None:
+            raise HTTPException(status_code=404, detail=f"Meal with ID {meal_id} not found.")
         raise HTTPException(
             status_code=403,
             detail="This meal does not belong to your active diet plan."
         )
 
-    meal_name = meal.name
-    await db.delete(meal)
     await db.commit()
+    invalidate_current_diet()
 
-    logger.info(f"Deleted meal '{meal_name}' (ID {meal_id}) and all its items")
+    logger.info("Deleted meal '%s' (ID %s) and all its items", meal_name, meal_id)
 
     return MessageResponse(
         message="Meal deleted successfully.",
@@ -603,7 +645,8 @@ async def delete_meal(
 async def add_item_to_meal(
     meal_id: int,
     item: MealItemCreate,
-    db: AsyncSession = Depends(get_db),
+    db: DB,
+    response: Response,
 ):
     """
     Add a food item to a meal with a specific quantity.
@@ -616,57 +659,101 @@ async def add_item_to_meal(
       { "food_item_id": 42, "quantity_grams": 200 }
       
       If food #42 has 165 kcal/100g, the calculated calories = (200/100) * 165 = 330 kcal
-    """
-    # Verify the meal exists
-    stmt = select(Meal).where(Meal.id == meal_id)
-    result = await db.execute(stmt)
-    meal = result.scalar_one_or_none()
 
-    if not meal:
+    If the food is already in the meal, the quantity is added to the existing
+    item instead of creating a second one (the same rule the startup
+    migration used to merge repeated foods). The response is 201 when the
+    item was created and 200 when an existing one was increased.
+    """
+    # Insert the meal item (the link between meal and food) with its macros
+    # computed from the food row, and read the food's name back, in one
+    # statement. No row means the food item does not exist; the meal is
+    # checked by the meal_items foreign key.
+    # A food appears once per meal (uq_meal_items_meal_food): adding it again
+    # adds to the existing row's quantity, and its macros are recomputed from
+    # the summed quantity exactly as update_meal_item would write them.
+    quantity = literal(item.quantity_grams, Float)
+    macros = meal_item_macros_sql(quantity)
+    upsert = pg_insert(MealItem).from_select(
+        ["meal_id", "food_item_id", "quantity_grams", *macros],
+        select(literal(meal_id, Integer), FoodItem.id, quantity, *macros.values())
+        .where(FoodItem.id == item.food_item_id),
+    )
+    summed_quantity = MealItem.quantity_grams + upsert.excluded.quantity_grams
+    # ON CONFLICT DO UPDATE cannot join the food row, so each per-100g value
+    # is read by a primary key subquery
+    conflict_food = SimpleNamespace(**{
+        per_100g: select(getattr(FoodItem, per_100g))
+        .where(FoodItem.id == item.food_item_id)
+        .scalar_subquery()
+        for per_100g in MEAL_ITEM_MACRO_COLUMNS.values()
+    })
+    inserted = (
+        upsert.on_conflict_do_update(
+            index_elements=[MealItem.meal_id, MealItem.food_item_id],
+            set_={
+                "quantity_grams": summed_quantity,
+                **meal_item_macros_sql(summed_quantity, conflict_food),
+            },
+        )
+        .returning(
+            MealItem.id,
+            MealItem.food_item_id,
+            MealItem.quantity_grams,
+            *_STORED_MACRO_COLUMNS,
+            # xmax is 0 for a freshly inserted row and set when the
+            # conflict branch updated an existing one
+            literal_column("xmax <> 0", Boolean).label("updated"),
+        )
+        .cte("inserted")
+    )
+    stmt = (
+        select(inserted, FoodItem.name)
+        .join(FoodItem, FoodItem.id == inserted.c.food_item_id)
+    )
+    try:
+        row = (await db.execute(stmt)).one_or_none()
+        await db.commit()
+        invalidate_current_diet()
+    except IntegrityError as exc:
+        await db.rollback()
+        # A missing food item yields no row from the SELECT feeding the
+        # INSERT (handled below), so only the meal FK can reject it here
+        if violated_constraint(exc) != "meal_items_meal_id_fkey":
+            raise
         raise HTTPException(
             status_code=404,
             detail=f"Meal with ID {meal_id} not found."
-        )
-
-    # Verify the food item exists
-    food_stmt = select(FoodItem).where(FoodItem.id == item.food_item_id)
-    food_result = await db.execute(food_stmt)
-    food = food_result.scalar_one_or_none()
+        ) from exc
 
-    if not food:
+    if row is None:
         raise HTTPException(
             status_code=404,
             detail=f"Food item with ID {item.food_item_id} not found."
         )
 
-    # Create the meal item (the link between meal and food)
-    db_item = MealItem(
-        meal_id=meal_id,
-        food_item_id=item.food_item_id,
-        quantity_grams=item.quantity_grams,
-    )
-    db.add(db_item)
-    await db.commit()
-    await db.refresh(db_item)
-
-    # Calculate the macros for the response
-    # Formula: (quantity / 100) * value_per_100g
-    qty_factor = item.quantity_grams / 100
-
-    logger.info(
-        f"Added {item.quantity_grams}g of '{food.name}' to meal ID {meal_id} "
-        f"({round(qty_factor * food.calories_kcal, 2)} kcal)"
-    )
+    if row.updated:
+        response.status_code = 200
+        logger.info(
+            "Added %sg of '%s' to its item in meal ID %s, now %sg (%s kcal)",
+            item.quantity_grams, row.name, meal_id, row.quantity_grams, row.calculated_calories,
+        )
+    else:
+        logger.info(
+            "Added %sg of '%s' to meal ID %s (%s kcal)",
+            item.quantity_grams, row.name, meal_id, row.calculated_calories,
+        )
 
-    return MealItemResponse(
-        id=db_item.id,
-        food_item_id=food.id,
-        food_item_name=food.name,
-        quantity_grams=item.quantity_grams,
-        calculated_calories=round(qty_factor * food.calories_kcal, 2),
-        calculated_protein=round(qty_factor * food.protein_g, 2),
-        calculated_carbs=round(qty_factor * food.carbs_g, 2),
-        calculated_fat=round(qty_factor * food.fat_g, 2),
+    # Values come straight from the database row, so validation is skipped
+    return MealItemResponse.model_construct(
+        id=row.id,
+        food_item_id=item.food_item_id,
+        food_item_name=row.name,
+        quantity_grams=row.quantity_grams,
+        calculated_calories=row.calculated_calories,
+        calculated_protein=row.calculated_protein,
+        calculated_carbs=row.calculated_carbs,
+        calculated_fat=row.calculated_fat,
     )
 
 
@@ -674,15 +761,26 @@ async def add_item_to_meal(
 async def update_diet_plan_targets(
     plan_id: int,
     update: DietPlanUpdate,
-    db: AsyncSession = Depends(get_db),
+    db: DB,
 ):
     """
     Update the macro targets of an existing diet plan.
     Only provided fields will be updated.
     """
-    stmt = select(DietPlan).where(DietPlan.id == plan_id)
-    result = await db.execute(stmt)
-    plan = result.scalar_one_or_none()
+    update_data = update.model_dump(exclude_unset=True)
+
+    if update_data:
+        # UPDATE ... RETURNING applies the change and gives back the updated
+        # row in one round trip, without loading the plan first
+        plan = await db.scalar(
+            sa_update(DietPlan)
+            .where(DietPlan.id == plan_id)
+            .values(**update_data)
+            .returning(DietPlan)
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        plan = await db.get(DietPlan, plan_id)
 
     if not plan:
         raise HTTPException(
@@ -690,14 +788,11 @@ async def update_diet_plan_targets(
             detail=f"Diet plan with ID {plan_id} not found."
         )
 
-    update_data = update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(plan, field, value)
-
-    await db.commit()
-    await db.refresh(plan)
+    if update_data:
+        await db.commit()
+        invalidate_current_diet()
 
-    logger.info(f"Updated targets for plan ID {plan_id}: {update_data}")
+    logger.info("Updated targets for plan ID %s: %s", plan_id, update_data)
     return plan
 
 
@@ -705,51 +800,61 @@ async def update_diet_plan_targets(
 async def update_meal_item(
     item_id: int,
     update: MealItemUpdate,
-    db: AsyncSession = Depends(get_db),
+    db: DB,
 ):
     """
     Update the quantity of a meal item.
     Returns the updated item with recalculated macros.
     """
+    # Set the quantity and recompute the stored macros from the food row in
+    # one UPDATE ... FROM food_items ... RETURNING
+    # (Core tables: the ORM-enabled UPDATE cannot return the joined food name)
+    meal_items = MealItem.__table__
+    food_items = FoodItem.__table__
+    quantity = literal(update.quantity_grams, Float)
     stmt = (
-        select(MealItem)
-        .where(MealItem.id == item_id)
-        .options(selectinload(MealItem.food_item))
+        sa_update(meal_items)
+        .where(meal_items.c.id == item_id)
+        .where(food_items.c.id == meal_items.c.food_item_id)
+        .values(quantity_grams=quantity, **meal_item_macros_sql(quantity, food_items.c))
+        .returning(
+            meal_items.c.id,
+            meal_items.c.food_item_id,
+            food_items.c.name,
+            meal_items.c.quantity_grams,
+            *_STORED_MACRO_COLUMNS,
+        )
     )
-    result = await db.execute(stmt)
-    item = result.scalar_one_or_none()
+    row = (await db.execute(stmt)).one_or_none()
 
-    if not item:
+    if not row:
         raise HTTPException(
             status_code=404,
             detail=f"Meal item with ID {item_id} not found."
         )
 
-    item.quantity_grams = update.quantity_grams
     await db.commit()
-    await db.refresh(item)
-
-    food = item.food_item
-    qty_factor = item.quantity_grams / 100
-
-    logger.info(f"Updated meal item ID {item_id}: quantity={update.quantity_grams}g")
-
-    return MealItemResponse(
-        id=item.id,
-        food_item_id=food.id,
-        food_item_name=food.name,
-        quantity_grams=item.quantity_grams,
-        calculated_calories=round(qty_factor * food.calories_kcal, 2),
-        calculated_protein=round(qty_factor * food.protein_g, 2),
-        calculated_carbs=round(qty_factor * food.carbs_g, 2),
-        calculated_fat=round(qty_factor * food.fat_g, 2),
+    invalidate_current_diet()
+
+    logger.info("Updated meal item ID %s: quantity=%sg", item_id, update.quantity_grams)
+
+    # Values come straight from the database row, so validation is skipped
+    return MealItemResponse.model_construct(
+        id=row.id,
+        food_item_id=row.food_item_id,
+        food_item_name=row.name,
+        quantity_grams=row.quantity_grams,
+        calculated_calories=row.calculated_calories,
+        calculated_protein=row.calculated_protein,
+        calculated_carbs=row.calculated_carbs,
+        calculated_fat=row.calculated_fat,
     )
 
 
 @router.delete("/meal-items/{item_id}", response_model=MessageResponse)
 async def remove_meal_item(
     item_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: DB,
 ):
     """
     Remove a food item from a meal.
@@ -757,20 +862,21 @@ async def remove_meal_item(
     This deletes the MealItem record (the link between meal and food).
     The FoodItem itself is NOT deleted — only the association.
     """
-    stmt = select(MealItem).where(MealItem.id == item_id)
-    result = await db.execute(stmt)
-    item = result.scalar_one_or_none()
+    # DELETE ... RETURNING both removes the item and reports whether it existed
+    deleted_id = await db.scalar(
+        delete(MealItem).where(MealItem.id == item_id).returning(MealItem.id)
+    )
 
-    if not item:
+    if deleted_id is None:
         raise HTTPException(
             status_code=404,
             detail=f"Meal item with ID {item_id} not found."
         )
 
-    await db.delete(item)
     await db.commit()
+    invalidate_current_diet()
 
-    logger.info(f"Removed meal item ID {item_id}")
+    logger.info("Removed meal item ID %s", item_id)
 
     return MessageResponse(
         message="Meal item removed successfully.",
@@ -782,42 +888,96 @@ async def remove_meal_item(
 # EXPORT ENDPOINTS (Excel & PDF)
 # ============================================================
 
+# XlsxWriter format properties of the Excel export. Formats belong to a
+# workbook, so each export creates one Format per entry. Every row style has
+# a text format for column A and a centered numeric one for columns B-F.
+_EXCEL_BORDER = {"border": 1}
+_EXCEL_NUMBER = {"border": 1, "align": "center", "num_format": "0.0"}
+_EXCEL_FORMATS = {
+    "header": {"bold": True, "font_color": "#FFFFFF", "bg_color": "#2563EB", "align": "center", "border": 1},
+    "meal": {"bold": True, "bg_color": "#DBEAFE", "border": 1},
+    "item_text": _EXCEL_BORDER,
+    "item_number": _EXCEL_NUMBER,
+    "subtotal_text": {**_EXCEL_BORDER, "bold": True, "italic": True},
+    "subtotal_number": {**_EXCEL_NUMBER, "bold": True, "italic": True},
+    "total_text": {**_EXCEL_BORDER, "bold": True, "bg_color": "#FEF3C7"},
+    "total_number": {**_EXCEL_NUMBER, "bold": True, "bg_color": "#FEF3C7"},
+    "target_text": {**_EXCEL_BORDER, "bold": True, "bg_color": "#D1FAE5"},
+    "target_number": {**_EXCEL_NUMBER, "bold": True, "bg_color": "#D1FAE5"},
+}
+
+
 @router.get("/export/excel")
 async def export_diet_excel(
+    db: DB,
     user_id: str = "default_user",
-    db: AsyncSession = Depends(get_db),
 ):
     """
     Export the current diet plan (all variations) as an Excel file.
     Each variation gets its own sheet.
     """
-    try:
-        plan_data = await get_current_diet_full(db, user_id)
-    except ValueError as e:
-        raise HTTPException(status_code=404, detail=str(e))
-
-    import openpyxl
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-
-    wb = openpyxl.Workbook()
-    # Remove the default sheet
-    wb.remove(wb.active)
-
-    # Styles
-    header_font = Font(bold=True, color="FFFFFF", size=11)
-    header_fill = PatternFill(start_color="2563EB", end_color="2563EB", fill_type="solid")
-    meal_font = Font(bold=True, size=11)
-    meal_fill = PatternFill(start_color="DBEAFE", end_color="DBEAFE", fill_type="solid")
-    total_font = Font(bold=True, size=11)
-    total_fill = PatternFill(start_color="FEF3C7", end_color="FEF3C7", fill_type="solid")
-    target_fill = PatternFill(start_color="D1FAE5", end_color="D1FAE5", fill_type="solid")
-    thin_border = Border(
-        left=Side(style="thin"),
-        right=Side(style="thin"),
-        top=Side(style="thin"),
-        bottom=Side(style="thin"),
+    content = get_cached_export(user_id, "xlsx")
+    if content is None:
+        generation = cache_generation()
+        try:
+            plan_data = await get_current_diet_full(db, user_id)
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+
+        # Building the file is synchronous and CPU-bound; run it in a worker
+        # thread so other requests are served meanwhile
+        content = await run_in_threadpool(_build_excel_export, plan_data)
+        cache_export(user_id, "xlsx", content, generation)
+
+    return Response(
+        content=content,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": "attachment; filename=plano_alimentar.xlsx"},
+    )
+
+
+@router.get("/export/pdf")
+async def export_diet_pdf(
+    db: DB,
+    user_id: str = "default_user",
+):
+    """
+    Export the current diet plan (all variations) as a PDF file.
+    """
+    content = get_cached_export(user_id, "pdf")
+    if content is None:
+        generation = cache_generation()
+        try:
+            plan_data = await get_current_diet_full(db, user_id)
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+
+        content = await run_in_threadpool(_build_pdf_export, plan_data)
+        cache_export(user_id, "pdf", content, generation)
+
+    return Response(
+        content=content,
+        media_type="application/pdf",
+        headers={"Content-Disposition": "attachment; filename=plano_alimentar.pdf"},
     )
 
+
+# ----- Helper Functions -----
+
+def _build_excel_export(plan_data: dict) -> bytes:
+    """
+    Build the .xlsx file for export_diet_excel from get_current_diet_full's
+    data: one sheet per variation. Runs in a worker thread.
+    """
+    import xlsxwriter
+
+    buffer = io.BytesIO()
+    # in_memory keeps XlsxWriter from staging each sheet in a temp file
+    wb = xlsxwriter.Workbook(buffer, {"in_memory": True})
+
+    # One Format per entry of _EXCEL_FORMATS, shared by every cell using it
+    fmt = {name: wb.add_format(props) for name, props in _EXCEL_FORMATS.items()}
+
     variations = plan_data.get("variations", [])
     if not variations:
         # Fallback: build a single sheet from plan.meals
@@ -826,137 +986,83 @@ async def export_diet_excel(
             "meals": plan_data.get("meals", []),
         }]
 
+    sheet_names = set()
     for var in variations:
-        sheet_name = var["name"][:31]  # Excel sheet name max 31 chars
-        ws = wb.create_sheet(title=sheet_name)
+        ws = wb.add_worksheet(_unique_sheet_name(var["name"], sheet_names))
 
         # Column widths
-        ws.column_dimensions["A"].width = 30
-        ws.column_dimensions["B"].width = 14
-        ws.column_dimensions["C"].width = 14
-        ws.column_dimensions["D"].width = 14
-        ws.column_dimensions["E"].width = 14
-        ws.column_dimensions["F"].width = 14
-
-        # Header row
+        ws.set_column("A:A", 30)
+        ws.set_column("B:F", 14)
+
+        # Header row (rows and columns are 0-based)
         headers = ["Alimento", "Qtd (g)", "Calorias", "Proteína (g)", "Carboidratos (g)", "Gordura (g)"]
-        for col_idx, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_idx, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal="center")
-            cell.border = thin_border
+        ws.write_row(0, 0, headers, fmt["header"])
 
-        row = 2
-        grand_cal = grand_pro = grand_carb = grand_fat = 0.0
+        row = 1
 
         for meal in var.get("meals", []):
-            # Meal name row
-            ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=6)
-            cell = ws.cell(row=row, column=1, value=meal["name"])
-            cell.font = meal_font
-            cell.fill = meal_fill
-            cell.border = thin_border
+            # Meal name row, merged across all columns
+            ws.merge_range(row, 0, row, 5, meal["name"], fmt["meal"])
             row += 1
 
-            meal_cal = meal_pro = meal_carb = meal_fat = 0.0
-
             for item in meal.get("items", []):
-                ws.cell(row=row, column=1, value=item["food_item_name"]).border = thin_border
-                ws.cell(row=row, column=2, value=item["quantity_grams"]).border = thin_border
-                ws.cell(row=row, column=3, value=item["calculated_calories"]).border = thin_border
-                ws.cell(row=row, column=4, value=item["calculated_protein"]).border = thin_border
-                ws.cell(row=row, column=5, value=item["calculated_carbs"]).border = thin_border
-                ws.cell(row=row, column=6, value=item["calculated_fat"]).border = thin_border
-
-                for col in range(2, 7):
-                    ws.cell(row=row, column=col).alignment = Alignment(horizontal="center")
-                    ws.cell(row=row, column=col).number_format = "0.0"
-
-                meal_cal += item["calculated_calories"]
-                meal_pro += item["calculated_protein"]
-                meal_carb += item["calculated_carbs"]
-                meal_fat += item["calculated_fat"]
+                # write_string so food names are never read as formulas or URLs
+                ws.write_string(row, 0, item["food_item_name"], fmt["item_text"])
+                ws.write_row(row, 1, [
+                    item["quantity_grams"],
+                    item["calculated_calories"],
+                    item["calculated_protein"],
+                    item["calculated_carbs"],
+                    item["calculated_fat"],
+                ], fmt["item_number"])
                 row += 1
 
-            # Meal subtotal
-            ws.cell(row=row, column=1, value=f"Subtotal {meal['name']}").font = Font(bold=True, italic=True)
-            ws.cell(row=row, column=3, value=round(meal_cal, 1)).font = Font(bold=True, italic=True)
-            ws.cell(row=row, column=4, value=round(meal_pro, 1)).font = Font(bold=True, italic=True)
-            ws.cell(row=row, column=5, value=round(meal_carb, 1)).font = Font(bold=True, italic=True)
-            ws.cell(row=row, column=6, value=round(meal_fat, 1)).font = Font(bold=True, italic=True)
-            for col in range(1, 7):
-                ws.cell(row=row, column=col).border = thin_border
-                if col >= 2:
-                    ws.cell(row=row, column=col).alignment = Alignment(horizontal="center")
-                    ws.cell(row=row, column=col).number_format = "0.0"
+            # Meal subtotal (the quantity column is left blank); meal and
+            # variation totals come precomputed from get_current_diet_full
+            ws.write_string(row, 0, f"Subtotal {meal['name']}", fmt["subtotal_text"])
+            ws.write_blank(row, 1, None, fmt["item_number"])
+            ws.write_row(row, 2, [
+                round(meal["total_calories"], 1),
+                round(meal["total_protein"], 1),
+                round(meal["total_carbs"], 1),
+                round(meal["total_fat"], 1),
+            ], fmt["subtotal_number"])
             row += 1
 
-            grand_cal += meal_cal
-            grand_pro += meal_pro
-            grand_carb += meal_carb
-            grand_fat += meal_fat
-
-        # Grand total row
+        # Grand total row, after an empty row
         row += 1
-        for col_idx, value in enumerate(["TOTAL DO DIA", "", round(grand_cal, 1), round(grand_pro, 1), round(grand_carb, 1), round(grand_fat, 1)], 1):
-            cell = ws.cell(row=row, column=col_idx, value=value)
-            cell.font = total_font
-            cell.fill = total_fill
-            cell.border = thin_border
-            if col_idx >= 2:
-                cell.alignment = Alignment(horizontal="center")
-                cell.number_format = "0.0"
+        ws.write_string(row, 0, "TOTAL DO DIA", fmt["total_text"])
+        ws.write_row(row, 1, [
+            "",
+            round(var.get("total_calories", 0.0), 1),
+            round(var.get("total_protein", 0.0), 1),
+            round(var.get("total_carbs", 0.0), 1),
+            round(var.get("total_fat", 0.0), 1),
+        ], fmt["total_number"])
 
         # Targets row
         row += 1
-        targets = [
-            "META",
+        ws.write_string(row, 0, "META", fmt["target_text"])
+        ws.write_row(row, 1, [
             "",
             plan_data.get("target_calories", 0),
             plan_data.get("target_protein", 0),
             plan_data.get("target_carbs", 0),
             plan_data.get("target_fat", 0),
-        ]
-        for col_idx, value in enumerate(targets, 1):
-            cell = ws.cell(row=row, column=col_idx, value=value)
-            cell.font = total_font
-            cell.fill = target_fill
-            cell.border = thin_border
-            if col_idx >= 2:
-                cell.alignment = Alignment(horizontal="center")
-                cell.number_format = "0.0"
-
-    # Save to buffer
-    buffer = io.BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
+        ], fmt["target_number"])
 
-    return StreamingResponse(
-        buffer,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=plano_alimentar.xlsx"},
-    )
+    wb.close()
+    return buffer.getvalue()
 
 
-@router.get("/export/pdf")
-async def export_diet_pdf(
-    user_id: str = "default_user",
-    db: AsyncSession = Depends(get_db),
-):
+def _build_pdf_export(plan_data: dict) -> bytes:
     """
-    Export the current diet plan (all variations) as a PDF file.
+    Build the PDF file for export_diet_pdf from get_current_diet_full's
+    data. Runs in a worker thread.
     """
-    try:
-        plan_data = await get_current_diet_full(db, user_id)
-    except ValueError as e:
-        raise HTTPException(status_code=404, detail=str(e))
-
-    from reportlab.lib import colors
     from reportlab.lib.pagesizes import A4
-    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
     from reportlab.lib.units import mm
-    from reportlab.platypus import SimpleDocTemplate, Table as RLTable, TableStyle, Paragraph, Spacer
+    from reportlab.platypus import SimpleDocTemplate, Table as RLTable, Paragraph, Spacer
 
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(
@@ -968,33 +1074,12 @@ async def export_diet_pdf(
         bottomMargin=15 * mm,
     )
 
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        "CustomTitle",
-        parent=styles["Title"],
-        fontSize=16,
-        spaceAfter=6,
-    )
-    subtitle_style = ParagraphStyle(
-        "CustomSubtitle",
-        parent=styles["Heading2"],
-        fontSize=12,
-        spaceAfter=4,
-        textColor=colors.HexColor("#2563EB"),
-    )
-    variation_style = ParagraphStyle(
-        "VariationTitle",
-        parent=styles["Heading2"],
-        fontSize=14,
-        spaceBefore=12,
-        spaceAfter=6,
-        textColor=colors.HexColor("#1E40AF"),
-    )
+    styles = _pdf_styles()
 
     elements = []
 
     # Title
-    elements.append(Paragraph("Plano Alimentar", title_style))
+    elements.append(Paragraph("Plano Alimentar", styles["title"]))
     elements.append(Spacer(1, 3 * mm))
 
     # Targets summary
@@ -1009,33 +1094,23 @@ async def export_diet_pdf(
         ],
     ]
     target_table = RLTable(target_data, colWidths=[80, 80, 90, 100, 80])
-    target_table.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#2563EB")),
-        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("FONTSIZE", (0, 0), (-1, -1), 9),
-        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-        ("BACKGROUND", (0, 1), (-1, -1), colors.HexColor("#D1FAE5")),
-        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
-        ("TOPPADDING", (0, 0), (-1, -1), 4),
-    ]))
+    target_table.setStyle(styles["target_table"])
     elements.append(target_table)
     elements.append(Spacer(1, 6 * mm))
 
+    col_widths = [150, 60, 60, 60, 60, 60]
+
     variations = plan_data.get("variations", [])
     if not variations:
         variations = [{"name": "Principal", "meals": plan_data.get("meals", [])}]
 
     for var in variations:
-        elements.append(Paragraph(f"📋 {var['name']}", variation_style))
+        elements.append(Paragraph(f"📋 {var['name']}", styles["variation"]))
 
         for meal in var.get("meals", []):
-            elements.append(Paragraph(meal["name"], subtitle_style))
+            elements.append(Paragraph(meal["name"], styles["subtitle"]))
 
             table_data = [["Alimento", "Qtd (g)", "Kcal", "P (g)", "C (g)", "G (g)"]]
-            meal_cal = meal_pro = meal_carb = meal_fat = 0.0
 
             for item in meal.get("items", []):
                 table_data.append([
@@ -1046,46 +1121,148 @@ async def export_diet_pdf(
                     f"{item['calculated_carbs']:.1f}",
                     f"{item['calculated_fat']:.1f}",
                 ])
-                meal_cal += item["calculated_calories"]
-                meal_pro += item["calculated_protein"]
-                meal_carb += item["calculated_carbs"]
-                meal_fat += item["calculated_fat"]
 
-            # Subtotal row
+            # Subtotal row, from the meal totals of get_current_diet_full
             table_data.append([
                 "Subtotal",
                 "",
-                f"{meal_cal:.1f}",
-                f"{meal_pro:.1f}",
-                f"{meal_carb:.1f}",
-                f"{meal_fat:.1f}",
+                f"{meal['total_calories']:.1f}",
+                f"{meal['total_protein']:.1f}",
+                f"{meal['total_carbs']:.1f}",
+                f"{meal['total_fat']:.1f}",
             ])
 
-            col_widths = [150, 60, 60, 60, 60, 60]
             table = RLTable(table_data, colWidths=col_widths)
-            table.setStyle(TableStyle([
-                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#DBEAFE")),
-                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                ("FONTSIZE", (0, 0), (-1, -1), 8),
-                ("ALIGN", (1, 0), (-1, -1), "CENTER"),
-                ("GRID", (0, 0), (-1, -1), 0.5, colors.HexColor("#CBD5E1")),
-                ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-                ("BOTTOMPADDING", (0, 0), (-1, -1), 3),
-                ("TOPPADDING", (0, 0), (-1, -1), 3),
-                # Subtotal row styling
-                ("BACKGROUND", (0, -1), (-1, -1), colors.HexColor("#FEF3C7")),
-                ("FONTNAME", (0, -1), (-1, -1), "Helvetica-Bold"),
-            ]))
+            table.setStyle(styles["meal_table"])
             elements.append(table)
             elements.append(Spacer(1, 3 * mm))
 
         elements.append(Spacer(1, 4 * mm))
 
     doc.build(elements)
-    buffer.seek(0)
+    return buffer.getvalue()
 
-    return StreamingResponse(
-        buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": "attachment; filename=plano_alimentar.pdf"},
+
+@lru_cache(maxsize=1)
+def _pdf_styles() -> dict:
+    """
+    Paragraph and table styles of the PDF export, built once per process.
+
+    Styles are only read while a document is built, so every export (in
+    any worker thread) shares the same instances. The meal table style
+    fits every meal: its subtotal commands address the last row.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.platypus import TableStyle
+
+    sample = getSampleStyleSheet()
+    return {
+        "title": ParagraphStyle(
+            "CustomTitle",
+            parent=sample["Title"],
+            fontSize=16,
+            spaceAfter=6,
+        ),
+        "subtitle": ParagraphStyle(
+            "CustomSubtitle",
+            parent=sample["Heading2"],
+            fontSize=12,
+            spaceAfter=4,
+            textColor=colors.HexColor("#2563EB"),
+        ),
+        "variation": ParagraphStyle(
+            "VariationTitle",
+            parent=sample["Heading2"],
+            fontSize=14,
+            spaceBefore=12,
+            spaceAfter=6,
+            textColor=colors.HexColor("#1E40AF"),
+        ),
+        "target_table": TableStyle([
+            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#2563EB")),
+            ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("FONTSIZE", (0, 0), (-1, -1), 9),
+            ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+            ("BACKGROUND", (0, 1), (-1, -1), colors.HexColor("#D1FAE5")),
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
+            ("TOPPADDING", (0, 0), (-1, -1), 4),
+        ]),
+        "meal_table": TableStyle([
+            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#DBEAFE")),
+            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("FONTSIZE", (0, 0), (-1, -1), 8),
+            ("ALIGN", (1, 0), (-1, -1), "CENTER"),
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.HexColor("#CBD5E1")),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 3),
+            ("TOPPADDING", (0, 0), (-1, -1), 3),
+            # Subtotal row styling
+            ("BACKGROUND", (0, -1), (-1, -1), colors.HexColor("#FEF3C7")),
+            ("FONTNAME", (0, -1), (-1, -1), "Helvetica-Bold"),
+        ]),
+    }
+
+
+def _unique_sheet_name(name: str, used: set[str]) -> str:
+    """
+    Excel sheet name for a variation: at most 31 characters and unique
+    (case-insensitively) within the workbook, numbering repeated names.
+    Adds the chosen name to `used`.
+    """
+    sheet_name = name[:31]
+    suffix = 1
+    while sheet_name.lower() in used:
+        tail = str(suffix)
+        sheet_name = name[:31 - len(tail)] + tail
+        suffix += 1
+    used.add(sheet_name.lower())
+    return sheet_name
+
+
+def _json_response(model: BaseModel, status_code: int = 200) -> Response:
+    """
+    Encode an already validated response model straight to JSON.
+
+    Returning the model itself makes FastAPI dump it, validate the dump
+    against response_model and dump it again; for variations with many
+    meals and items that repeated walk dominates the response time.
+    """
+    return Response(
+        content=orjson.dumps(model.model_dump(mode="json")),
+        status_code=status_code,
+        media_type="application/json",
+    )
+
+
+def _meal_response(meal_data: dict) -> MealResponse:
+    """
+    MealResponse for `build_meal_data` output.
+
+    The data is built from database rows, so validation is skipped; nested
+    items are constructed too, so the model serializes without warnings.
+    """
+    items = [MealItemResponse.model_construct(**item) for item in meal_data["items"]]
+    return MealResponse.model_construct(**{**meal_data, "items": items})
+
+
+def _empty_meal_response(meal: Meal) -> MealResponse:
+    """
+    Response for a meal that was just created (no items, zero totals).
+
+    Built with model_construct: every value is already the right type, so
+    pydantic validation is skipped.
+    """
+    return MealResponse.model_construct(
+        id=meal.id,
+        name=meal.name,
+        order_index=meal.order_index,
+        items=[],
+        total_calories=0.0,
+        total_protein=0.0,
+        total_carbs=0.0,
+        total_fat=0.0,
     )
@@ -13,11 +13,10 @@ Endpoints:
 import logging
 from typing import Optional
 
-from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi import APIRouter, File, HTTPException, Query, UploadFile
 from sqlalchemy import func, select
-from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core.database import DB
 from app.models import FoodItem
 from app.schemas import FoodItemCreate, FoodItemResponse, ImportResult
 from app.services.importer import import_taco_csv
@@ -30,13 +29,13 @@ router = APIRouter(prefix="/foods", tags=["Foods"])
 
 @router.get("/", response_model=list[FoodItemResponse])
 async def list_foods(
+    db: DB,
     search: Optional[str] = Query(
         default=None,
         description="Search foods by name (case-insensitive partial match)"
     ),
     skip: int = Query(default=0, ge=0, description="Number of records to skip (pagination)"),
     limit: int = Query(default=50, ge=1, le=200, description="Max records to return"),
-    db: AsyncSession = Depends(get_db),
 ):
     """
     List all food items, with optional search by name.
@@ -69,7 +68,7 @@ async def list_foods(
 @router.post("/", response_model=FoodItemResponse, status_code=201)
 async def create_food(
     food: FoodItemCreate,
-    db: AsyncSession = Depends(get_db),
+    db: DB,
 ):
     """
     Create a new food item manually.
@@ -93,25 +92,22 @@ async def create_food(
     # Add to session and commit
     db.add(db_food)
     await db.commit()
-    await db.refresh(db_food)  # Refresh to get the auto-generated ID and timestamp
 
-    logger.info(f"Created food item: {db_food.name} (ID: {db_food.id})")
+    logger.info("Created food item: %s (ID: %s)", db_food.name, db_food.id)
     return db_food
 
 
 @router.get("/{food_id}", response_model=FoodItemResponse)
 async def get_food(
     food_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: DB,
 ):
     """
     Get a specific food item by its ID.
     
     Returns 404 if the food item doesn't exist.
     """
-    stmt = select(FoodItem).where(FoodItem.id == food_id)
-    result = await db.execute(stmt)
-    food = result.scalar_one_or_none()
+    food = await db.get(FoodItem, food_id)
 
     if not food:
         raise HTTPException(
@@ -124,10 +120,10 @@ async def get_food(
 
 @router.post("/import-taco", response_model=ImportResult, status_code=201)
 async def import_taco(
+    db: DB,
     file: UploadFile = File(
         ..., description="TACO CSV file to import"
     ),
-    db: AsyncSession = Depends(get_db),
 ):
     """
     Bulk import food items from a TACO (Tabela Brasileira de Composição de Alimentos) CSV file.
@@ -168,8 +164,8 @@ async def import_taco(
         result = await import_taco_csv(db, content)
 
         logger.info(
-            f"TACO import complete: "
-            f"{result['rows_imported']}/{result['total_rows_processed']} rows imported"
+            "TACO import complete: %s/%s rows imported",
+            result["rows_imported"], result["total_rows_processed"],
         )
 
         return ImportResult(
@@ -183,7 +179,7 @@ async def import_taco(
         # Column mapping errors or other data issues
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"TACO import failed: {e}", exc_info=True)
+        logger.error("TACO import failed: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to import CSV: {str(e)}"
@@ -13,7 +13,7 @@ All schemas use Pydantic V2 with model_config for configuration.
 
 import datetime
 
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 
 
 # ============================================================
@@ -283,72 +283,83 @@ class BodyLogCreate(BaseModel):
     Schema for creating a new body measurement log.
     Only date and weight are required — everything else is optional.
     This lets the user log just weight one day, and full measurements another.
+
+    Upper bounds mirror the NUMERIC precision of the body_logs columns
+    (999.99 for measurements, 9999.99 for weight).
     """
     date: datetime.date = Field(..., description="Date of the measurement")
     user_id: str = Field(default="default_user", description="User identifier")
-    weight_kg: float = Field(..., gt=0, description="Body weight in kilograms")
+    weight_kg: float = Field(..., gt=0, le=9999.99, description="Body weight in kilograms")
 
     # Bioimpedance (from smart scale / InBody machine)
     bio_body_fat_percent: float | None = Field(default=None, ge=0, le=100)
-    bio_muscle_mass_kg: float | None = Field(default=None, ge=0)
+    bio_muscle_mass_kg: float | None = Field(default=None, ge=0, le=999.99)
 
     # Skinfold measurements in millimeters (Pollock 7-fold protocol)
-    skinfold_chest: float | None = Field(default=None, ge=0)
-    skinfold_axillary: float | None = Field(default=None, ge=0)
-    skinfold_triceps: float | None = Field(default=None, ge=0)
-    skinfold_subscapular: float | None = Field(default=None, ge=0)
-    skinfold_suprailiac: float | None = Field(default=None, ge=0)
-    skinfold_abdominal: float | None = Field(default=None, ge=0)
-    skinfold_thigh: float | None = Field(default=None, ge=0)
+    skinfold_chest: float | None = Field(default=None, ge=0, le=999.99)
+    skinfold_axillary: float | None = Field(default=None, ge=0, le=999.99)
+    skinfold_triceps: float | None = Field(default=None, ge=0, le=999.99)
+    skinfold_subscapular: float | None = Field(default=None, ge=0, le=999.99)
+    skinfold_suprailiac: float | None = Field(default=None, ge=0, le=999.99)
+    skinfold_abdominal: float | None = Field(default=None, ge=0, le=999.99)
+    skinfold_thigh: float | None = Field(default=None, ge=0, le=999.99)
 
     # Circumference measurements in centimeters
-    circ_neck: float | None = Field(default=None, ge=0)
-    circ_shoulder: float | None = Field(default=None, ge=0)
-    circ_chest_relaxed: float | None = Field(default=None, ge=0)
-    circ_arm_relaxed_right: float | None = Field(default=None, ge=0)
-    circ_arm_relaxed_left: float | None = Field(default=None, ge=0)
-    circ_arm_contracted_right: float | None = Field(default=None, ge=0)
-    circ_arm_contracted_left: float | None = Field(default=None, ge=0)
-    circ_forearm_right: float | None = Field(default=None, ge=0)
-    circ_forearm_left: float | None = Field(default=None, ge=0)
-    circ_waist: float | None = Field(default=None, ge=0)
-    circ_abdomen: float | None = Field(default=None, ge=0)
-    circ_hips: float | None = Field(default=None, ge=0)
-    circ_thigh_proximal_right: float | None = Field(default=None, ge=0)
-    circ_thigh_proximal_left: float | None = Field(default=None, ge=0)
-    circ_calf_right: float | None = Field(default=None, ge=0)
-    circ_calf_left: float | None = Field(default=None, ge=0)
+    circ_neck: float | None = Field(default=None, ge=0, le=999.99)
+    circ_shoulder: float | None = Field(default=None, ge=0, le=999.99)
+    circ_chest_relaxed: float | None = Field(default=None, ge=0, le=999.99)
+    circ_arm_relaxed_right: float | None = Field(default=None, ge=0, le=999.99)
+    circ_arm_relaxed_left: float | None = Field(default=None, ge=0, le=999.99)
+    circ_arm_contracted_right: float | None = Field(default=None, ge=0, le=999.99)
+    circ_arm_contracted_left: float | None = Field(default=None, ge=0, le=999.99)
+    circ_forearm_right: float | None = Field(default=None, ge=0, le=999.99)
+    circ_forearm_left: float | None = Field(default=None, ge=0, le=999.99)
+    circ_waist: float | None = Field(default=None, ge=0, le=999.99)
+    circ_abdomen: float | None = Field(default=None, ge=0, le=999.99)
+    circ_hips: float | None = Field(default=None, ge=0, le=999.99)
+    circ_thigh_proximal_right: float | None = Field(default=None, ge=0, le=999.99)
+    circ_thigh_proximal_left: float | None = Field(default=None, ge=0, le=999.99)
+    circ_calf_right: float | None = Field(default=None, ge=0, le=999.99)
+    circ_calf_left: float | None = Field(default=None, ge=0, le=999.99)
 
 
 class BodyLogUpdate(BaseModel):
     """Schema for updating an existing body log entry."""
     date: datetime.date | None = None
-    weight_kg: float | None = Field(default=None, gt=0)
+    weight_kg: float | None = Field(default=None, gt=0, le=9999.99)
     bio_body_fat_percent: float | None = Field(default=None, ge=0, le=100)
-    bio_muscle_mass_kg: float | None = Field(default=None, ge=0)
-    skinfold_chest: float | None = Field(default=None, ge=0)
-    skinfold_axillary: float | None = Field(default=None, ge=0)
-    skinfold_triceps: float | None = Field(default=None, ge=0)
-    skinfold_subscapular: float | None = Field(default=None, ge=0)
-    skinfold_suprailiac: float | None = Field(default=None, ge=0)
-    skinfold_abdominal: float | None = Field(default=None, ge=0)
-    skinfold_thigh: float | None = Field(default=None, ge=0)
-    circ_neck: float | None = Field(default=None, ge=0)
-    circ_shoulder: float | None = Field(default=None, ge=0)
-    circ_chest_relaxed: float | None = Field(default=None, ge=0)
-    circ_arm_relaxed_right: float | None = Field(default=None, ge=0)
-    circ_arm_relaxed_left: float | None = Field(default=None, ge=0)
-    circ_arm_contracted_right: float | None = Field(default=None, ge=0)
-    circ_arm_contracted_left: float | None = Field(default=None, ge=0)
-    circ_forearm_right: float | None = Field(default=None, ge=0)
-    circ_forearm_left: float | None = Field(default=None, ge=0)
-    circ_waist: float | None = Field(default=None, ge=0)
-    circ_abdomen: float | None = Field(default=None, ge=0)
-    circ_hips: float | None = Field(default=None, ge=0)
-    circ_thigh_proximal_right: float | None = Field(default=None, ge=0)
-    circ_thigh_proximal_left: float | None = Field(default=None, ge=0)
-    circ_calf_right: float | None = Field(default=None, ge=0)
-    circ_calf_left: float | None = Field(default=None, ge=0)
+    bio_muscle_mass_kg: float | None = Field(default=None, ge=0, le=999.99)
+    skinfold_chest: float | None = Field(default=None, ge=0, le=999.99)
+    skinfold_axillary: float | None = Field(default=None, ge=0, le=999.99)
+    skinfold_triceps: float | None = Field(default=None, ge=0, le=999.99)
+    skinfold_subscapular: float | None = Field(default=None, ge=0, le=999.99)
+    skinfold_suprailiac: float | None = Field(default=None, ge=0, le=999.99)
+    skinfold_abdominal: float | None = Field(default=None, ge=0, le=999.99)
+    skinfold_thigh: float | None = Field(default=None, ge=0, le=999.99)
+    circ_neck: float | None = Field(default=None, ge=0, le=999.99)
+    circ_shoulder: float | None = Field(default=None, ge=0, le=999.99)
+    circ_chest_relaxed: float | None = Field(default=None, ge=0, le=999.99)
+    circ_arm_relaxed_right: float | None = Field(default=None, ge=0, le=999.99)
+    circ_arm_relaxed_left: float | None = Field(default=None, ge=0, le=999.99)
+    circ_arm_contracted_right: float | None = Field(default=None, ge=0, le=999.99)
+    circ_arm_contracted_left: float | None = Field(default=None, ge=0, le=999.99)
+    circ_forearm_right: float | None = Field(default=None, ge=0, le=999.99)
+    circ_forearm_left: float | None = Field(default=None, ge=0, le=999.99)
+    circ_waist: float | None = Field(default=None, ge=0, le=999.99)
+    circ_abdomen: float | None = Field(default=None, ge=0, le=999.99)
+    circ_hips: float | None = Field(default=None, ge=0, le=999.99)
+    circ_thigh_proximal_right: float | None = Field(default=None, ge=0, le=999.99)
+    circ_thigh_proximal_left: float | None = Field(default=None, ge=0, le=999.99)
+    circ_calf_right: float | None = Field(default=None, ge=0, le=999.99)
+    circ_calf_left: float | None = Field(default=None, ge=0, le=999.99)
+
+    @field_validator("date", "weight_kg")
+    @classmethod
+    def reject_null_required_fields(cls, value):
+        """`date` and `weight_kg` may be omitted, but the stored log always has them."""
+        if value is None:
+            raise ValueError("may be omitted but not null")
+        return value
 
 
 class BodyLogResponse(BaseModel):
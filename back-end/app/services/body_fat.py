@@ -19,12 +19,38 @@ SIRI EQUATION (1961):
 
 NOTE: This implementation uses the male equation. For a production app,
 you would also implement the female equation and let the user specify sex.
+
+The results are stored on each BodyLog when it is written (see
+`calculated_body_fat_fields`); `skinfold_body_density_sql` and
+`skinfold_body_fat_sql` compute the same values inside a SQL statement.
 """
 
 import logging
 
+from sqlalchemy import Float, Numeric, case, cast, func
+
 logger = logging.getLogger(__name__)
 
+# The 7 Pollock sites, in the order they are summed
+SKINFOLD_FIELDS = (
+    "skinfold_chest",
+    "skinfold_axillary",
+    "skinfold_triceps",
+    "skinfold_subscapular",
+    "skinfold_suprailiac",
+    "skinfold_abdominal",
+    "skinfold_thigh",
+)
+
+
+def has_all_skinfolds(log) -> bool:
+    """
+    Check whether `log` has all 7 skinfold measurements for the Pollock calculation.
+
+    Works for BodyLog rows and BodyLogCreate/BodyLogUpdate schemas alike.
+    """
+    return None not in tuple(getattr(log, field) for field in SKINFOLD_FIELDS)
+
 
 def calculate_body_density_pollock_7(
     sum_of_skinfolds_mm: float,
@@ -48,17 +74,18 @@ def calculate_body_density_pollock_7(
         body density of men. British Journal of Nutrition, 40, 497-504.
     """
     s = sum_of_skinfolds_mm
+    # Horner form of 1.112 - 0.00043499·S + 0.00000055·S² (two multiplies
+    # instead of three); skinfold_body_density_sql uses the same order
     body_density = (
-        1.112
-        - (0.00043499 * s)
-        + (0.00000055 * s * s)
+        (0.00000055 * s - 0.00043499) * s + 1.112
         - (0.00028826 * age_years)
     )
 
     logger.info(
-        f"Pollock 7-fold calculation: "
-        f"sum_skinfolds={s}mm, age={age_years}, "
-        f"body_density={body_density:.6f} g/cm³"
+        "Pollock 7-fold calculation: "
+        "sum_skinfolds=%smm, age=%s, "
+        "body_density=%.6f g/cm³",
+        s, age_years, body_density,
     )
 
     return round(body_density, 6)
@@ -86,7 +113,7 @@ def body_density_to_fat_percent(body_density: float) -> float:
         Academy of Sciences.
     """
     if body_density <= 0:
-        logger.warning(f"Invalid body density: {body_density}. Returning 0.")
+        logger.warning("Invalid body density: %s. Returning 0.", body_density)
         return 0.0
 
     fat_percent = (495.0 / body_density) - 450.0
@@ -95,7 +122,7 @@ def body_density_to_fat_percent(body_density: float) -> float:
     fat_percent = max(0.0, min(fat_percent, 60.0))
 
     logger.info(
-        f"Siri equation: density={body_density:.6f} -> fat={fat_percent:.2f}%"
+        "Siri equation: density=%.6f -> fat=%.2f%%", body_density, fat_percent
     )
 
     return round(fat_percent, 2)
@@ -151,3 +178,74 @@ def calculate_body_fat_from_skinfolds(
         "body_density": body_density,
         "body_fat_percent": body_fat_percent,
     }
+
+
+def calculated_body_fat_fields(log) -> dict[str, float | None]:
+    """
+    Values for the stored BodyLog.calculated_* columns.
+
+    Both are None unless `log` (a BodyLog row or a BodyLogCreate schema) has
+    all 7 skinfold measurements.
+    """
+    if not has_all_skinfolds(log):
+        return {"calculated_body_density": None, "calculated_body_fat_percent": None}
+
+    body_fat_result = calculate_body_fat_from_skinfolds(
+        log.skinfold_chest,
+        log.skinfold_axillary,
+        log.skinfold_triceps,
+        log.skinfold_subscapular,
+        log.skinfold_suprailiac,
+        log.skinfold_abdominal,
+        log.skinfold_thigh,
+    )
+    return {
+        "calculated_body_density": body_fat_result["body_density"],
+        "calculated_body_fat_percent": body_fat_result["body_fat_percent"],
+    }
+
+
+def skinfold_body_density_sql(skinfold_columns, age_years: int = 25):
+    """
+    SQL expression computing the Pollock 7-fold body density in the query.
+
+    Mirrors `calculate_body_density_pollock_7`: the sum and the Horner-form
+    polynomial run in double precision in the same order as the Python code,
+    and the result is rounded to 6 decimals. NULL when any of the 7 skinfolds
+    is NULL.
+
+    Args:
+        skinfold_columns: The 7 skinfold column expressions, in SKINFOLD_FIELDS order
+        age_years: Age of the subject (default: 25)
+    """
+    columns = [cast(column, Float) for column in skinfold_columns]
+    s = columns[0]
+    for column in columns[1:]:
+        s = s + column
+
+    return cast(
+        func.round(
+            cast((0.00000055 * s - 0.00043499) * s + 1.112 - (0.00028826 * age_years), Numeric),
+            6,
+        ),
+        Float,
+    )
+
+
+def skinfold_body_fat_sql(skinfold_columns, age_years: int = 25):
+    """
+    SQL expression computing the Pollock 7-fold + Siri body fat % in the query.
+
+    Mirrors `calculate_body_fat_from_skinfolds`: the density from
+    `skinfold_body_density_sql` goes through the Siri equation, clamped to
+    0–60 and rounded to 2 decimals. NULL when any of the 7 skinfolds is NULL.
+    """
+    body_density = skinfold_body_density_sql(skinfold_columns, age_years)
+    fat_percent = 495.0 / body_density - 450.0
+    clamped = func.greatest(0.0, func.least(fat_percent, 60.0))
+
+    # GREATEST/LEAST skip NULL arguments, so keep incomplete rows NULL explicitly
+    return case(
+        (body_density.is_not(None), cast(func.round(cast(clamped, Numeric), 2), Float)),
+        else_=None,
+    )
@@ -34,10 +34,11 @@ import logging
 from datetime import date, datetime, timedelta, timezone
 from statistics import mean
 
-from sqlalchemy import select, and_
+from sqlalchemy import Row, select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import BodyLog, DietPlan
+from app.services.diet_calculator import invalidate_current_diet
 
 logger = logging.getLogger(__name__)
 
@@ -53,6 +54,18 @@ WAIST_GROWTH_THRESHOLD_CM = 0.5
 ARM_GROWTH_THRESHOLD_CM = 0.1
 BODY_FAT_CEILING_PERCENT = 20.0
 
+# The only BodyLog columns the analysis reads. Selecting them directly returns
+# lightweight Row tuples (attribute access, no ORM identity/state tracking)
+# instead of full BodyLog instances carrying ~30 measurement columns each.
+COACH_LOG_COLUMNS = (
+    BodyLog.date,
+    BodyLog.weight_kg,
+    BodyLog.bio_body_fat_percent,
+    BodyLog.circ_waist,
+    BodyLog.circ_arm_contracted_right,
+    BodyLog.circ_arm_relaxed_right,
+)
+
 
 async def check_stagnation(
     db: AsyncSession,
@@ -79,13 +92,13 @@ async def check_stagnation(
 
     # A1. Fetch all recent logs, ordered by date desc
     stmt = (
-        select(BodyLog)
+        select(*COACH_LOG_COLUMNS)
         .where(BodyLog.user_id == user_id)
         .order_by(BodyLog.date.desc())
         .limit(200)
     )
     result = await db.execute(stmt)
-    all_logs = result.scalars().all()
+    all_logs = result.all()
 
     if len(all_logs) < 2:
         raise ValueError(
@@ -137,11 +150,16 @@ async def check_stagnation(
     monthly_projection = weekly_rate * 4
 
     logger.info(
-        f"Coach analysis for user '{user_id}': "
-        f"T_curr={t_curr} (W_curr={w_curr:.2f}kg, {len(curr_window_logs)} logs), "
-        f"T_prev={t_prev} (W_prev={w_prev:.2f}kg, {len(prev_window_logs)} logs), "
-        f"weeks_elapsed={weeks_elapsed:.1f}, weekly_rate={weekly_rate:.3f} kg/week, "
-        f"monthly_projection={monthly_projection:.3f} kg/month"
+        "Coach analysis for user '%s': "
+        "T_curr=%s (W_curr=%.2fkg, %s logs), "
+        "T_prev=%s (W_prev=%.2fkg, %s logs), "
+        "weeks_elapsed=%.1f, weekly_rate=%.3f kg/week, "
+        "monthly_projection=%.3f kg/month",
+        user_id,
+        t_curr, w_curr, len(curr_window_logs),
+        t_prev, w_prev, len(prev_window_logs),
+        weeks_elapsed, weekly_rate,
+        monthly_projection,
     )
 
     # ── Fetch active plan ──
@@ -173,9 +191,10 @@ async def check_stagnation(
             if data_unchanged:
                 already_adjusted = True
                 logger.info(
-                    f"Coach already adjusted for W_curr={saved_w_curr}, "
-                    f"W_prev={saved_w_prev} (data unchanged). "
-                    f"Skipping suggestion until weight data changes."
+                    "Coach already adjusted for W_curr=%s, "
+                    "W_prev=%s (data unchanged). "
+                    "Skipping suggestion until weight data changes.",
+                    saved_w_curr, saved_w_prev,
                 )
 
     # ── C. Tri-State Calories-First Analysis ──
@@ -339,7 +358,7 @@ def _classify_weekly_rate(
 async def _get_measurement_changes(
     db: AsyncSession,
     user_id: str,
-    all_logs: list[BodyLog],
+    all_logs: list[Row],
     curr_window_start: date,
     prev_window_start: date,
     t_prev: date,
@@ -391,7 +410,7 @@ async def _get_measurement_changes(
     return waist_change, arm_change
 
 
-def _get_latest_body_fat(logs: list[BodyLog]) -> float | None:
+def _get_latest_body_fat(logs: list[Row]) -> float | None:
     """
     Get the most recent body fat percentage from logs.
     Prefers bio_body_fat_percent (from bioimpedance device).
@@ -463,9 +482,10 @@ async def dismiss_suggestion(
     await db.commit()
 
     logger.info(
-        f"Dismissed coach suggestion for user '{user_id}': "
-        f"fingerprint W_curr={w_curr:.2f}, W_prev={w_prev:.2f} "
-        f"(targets unchanged)"
+        "Dismissed coach suggestion for user '%s': "
+        "fingerprint W_curr=%.2f, W_prev=%.2f "
+        "(targets unchanged)",
+        user_id, w_curr, w_prev,
     )
 
 
@@ -539,14 +559,20 @@ async def apply_suggestion(
     if anchor_date is not None:
         plan.last_coach_anchor_date = anchor_date
 
+    # Every changed attribute was set above and expire_on_commit=False keeps
+    # them loaded, so the plan needs no refresh() after commit
     await db.commit()
-    await db.refresh(plan)
+    invalidate_current_diet()
 
     logger.info(
-        f"Applied coach suggestion for user '{user_id}': "
-        f"calories {old_calories} -> {plan.target_calories} ({calorie_adjustment:+.1f}), "
-        f"carbs {old_carbs} -> {plan.target_carbs} ({carb_adjustment_g:+.1f}g), "
-        f"fingerprint W_curr={w_curr:.2f}, W_prev={w_prev:.2f}"
+        "Applied coach suggestion for user '%s': "
+        "calories %s -> %s (%+.1f), "
+        "carbs %s -> %s (%+.1fg), "
+        "fingerprint W_curr=%.2f, W_prev=%.2f",
+        user_id,
+        old_calories, plan.target_calories, calorie_adjustment,
+        old_carbs, plan.target_carbs, carb_adjustment_g,
+        w_curr, w_prev,
     )
 
     return plan
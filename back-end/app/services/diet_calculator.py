@@ -15,88 +15,183 @@ The core formula for each MealItem is:
 Example:
   If a MealItem has 200g of Chicken Breast (31g protein per 100g):
   actual_protein = (200 / 100) * 31 = 62g protein
+
+The per-item values are stored on each MealItem when it is written (see
+`meal_item_macros_sql`), so reads only sum them.
+
+GET /diet/current can also keep the serialized response in an in-process
+cache (see `get_cached_current_diet`), and the export endpoints the files
+they generate (`get_cached_export`); every endpoint that changes a plan
+calls `invalidate_current_diet` after committing.
+
+Endpoints that only need the plan totals (e.g. the dashboard) should use
+`get_current_plan_totals`, which reads the `variation_macro_totals` view so
+PostgreSQL does the arithmetic in a single query instead of the whole ORM
+tree being materialized.
 """
 
 import logging
+import time
+from collections import OrderedDict
 
-from sqlalchemy import select
+from sqlalchemy import Float, Numeric, bindparam, cast, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import raiseload, selectinload
 
-from app.models import DietPlan, DietVariation, Meal, MealItem
+from app.core.config import get_settings
+from app.models import DietPlan, DietVariation, FoodItem, Meal, MealItem, variation_macro_totals
 
 logger = logging.getLogger(__name__)
 
+# Stored MealItem macro columns and the per-100g FoodItem column each comes from
+MEAL_ITEM_MACRO_COLUMNS = {
+    "calculated_calories": "calories_kcal",
+    "calculated_protein": "protein_g",
+    "calculated_carbs": "carbs_g",
+    "calculated_fat": "fat_g",
+}
 
-def _build_meals_data(meals: list) -> tuple[list[dict], float, float, float, float]:
+
+def meal_item_macros_sql(quantity_grams, food=FoodItem) -> dict:
     """
-    Build meals data with calculated macros from a list of Meal ORM objects.
+    SQL expressions for the stored MealItem.calculated_* columns.
 
-    Returns:
-        Tuple of (meals_data, total_cal, total_pro, total_carb, total_fat)
+    Each value is (quantity_grams / 100) * macro_per_100g rounded to 2
+    decimals, computed in the INSERT/UPDATE that writes the item so every
+    writer (and the migration backfill) stores the same numbers.
+
+    Args:
+        quantity_grams: Quantity expression (a column or a bound literal)
+        food: Entity or table whose per-100g macro columns are used (default: FoodItem)
+    """
+    return {
+        stored: cast(
+            func.round(cast(quantity_grams / 100 * getattr(food, per_100g), Numeric), 2),
+            Float,
+        )
+        for stored, per_100g in MEAL_ITEM_MACRO_COLUMNS.items()
+    }
+
+
+# ============================================================
+# PREBUILT STATEMENTS
+# ============================================================
+# Read statements for the hot endpoints, built once at import time. Each call
+# only binds `user_id`, so no statement is constructed per request and
+# SQLAlchemy's compiled cache and asyncpg's prepared statements are reused.
+_ACTIVE_PLAN_FULL_STMT = (
+    select(DietPlan)
+    .where(DietPlan.user_id == bindparam("user_id"))
+    .where(DietPlan.is_active == True)
+    .options(
+        # Load variations with their meals and items
+        selectinload(DietPlan.variations)
+        .selectinload(DietVariation.meals)
+        .selectinload(Meal.items)
+        # Item macros are stored on the item, so only the food name is read
+        .joinedload(MealItem.food_item, innerjoin=True)
+        .load_only(FoodItem.name),
+        # Any other relationship access raises instead of lazy-loading
+        raiseload("*"),
+    )
+)
+
+# ID of a plan's first variation (lowest order_index), correlated to DietPlan;
+# also used by the diet router to find where new meals go
+first_variation_id_subquery = (
+    select(DietVariation.id)
+    .where(DietVariation.diet_plan_id == DietPlan.id)
+    .order_by(DietVariation.order_index, DietVariation.id)
+    .limit(1)
+    .correlate(DietPlan)
+    .scalar_subquery()
+)
+
+# Targets of the active plan plus the view's totals for its first variation
+_PLAN_TOTALS_STMT = (
+    select(
+        DietPlan.target_calories,
+        DietPlan.target_protein,
+        DietPlan.target_carbs,
+        DietPlan.target_fat,
+        variation_macro_totals.c.total_calories,
+        variation_macro_totals.c.total_protein,
+        variation_macro_totals.c.total_carbs,
+        variation_macro_totals.c.total_fat,
+    )
+    .outerjoin(
+        variation_macro_totals,
+        variation_macro_totals.c.variation_id == first_variation_id_subquery,
+    )
+    .where(DietPlan.user_id == bindparam("user_id"))
+    .where(DietPlan.is_active == True)
+)
+
+def build_meal_data(meal) -> dict:
+    """
+    Build a single meal's data, with its items' stored macros and the meal
+    totals, from a Meal ORM object (items and their food items loaded).
+    Used by _build_meals_data and the rename_meal endpoint.
     """
-    meals_data = []
+    items_data = []
     total_calories = 0.0
     total_protein = 0.0
     total_carbs = 0.0
     total_fat = 0.0
 
-    for meal in meals:
-        meal_total_calories = 0.0
-        meal_total_protein = 0.0
-        meal_total_carbs = 0.0
-        meal_total_fat = 0.0
-
-        items_data = []
-
-        for item in meal.items:
-            calc_cal = round((item.quantity_grams / 100) * item.food_item.calories_kcal, 2)
-            calc_pro = round((item.quantity_grams / 100) * item.food_item.protein_g, 2)
-            calc_carb = round((item.quantity_grams / 100) * item.food_item.carbs_g, 2)
-            calc_fat = round((item.quantity_grams / 100) * item.food_item.fat_g, 2)
-
-            items_data.append({
-                "id": item.id,
-                "food_item_id": item.food_item_id,
-                "food_item_name": item.food_item.name,
-                "quantity_grams": item.quantity_grams,
-                "calculated_calories": calc_cal,
-                "calculated_protein": calc_pro,
-                "calculated_carbs": calc_carb,
-                "calculated_fat": calc_fat,
-            })
-
-            meal_total_calories += calc_cal
-            meal_total_protein += calc_pro
-            meal_total_carbs += calc_carb
-            meal_total_fat += calc_fat
-
-        meals_data.append({
-            "id": meal.id,
-            "name": meal.name,
-            "order_index": meal.order_index,
-            "items": items_data,
-            "total_calories": round(meal_total_calories, 2),
-            "total_protein": round(meal_total_protein, 2),
-            "total_carbs": round(meal_total_carbs, 2),
-            "total_fat": round(meal_total_fat, 2),
+    for item in meal.items:
+        calc_cal = item.calculated_calories
+        calc_pro = item.calculated_protein
+        calc_carb = item.calculated_carbs
+        calc_fat = item.calculated_fat
+
+        items_data.append({
+            "id": item.id,
+            "food_item_id": item.food_item_id,
+            "food_item_name": item.food_item.name,
+            "quantity_grams": item.quantity_grams,
+            "calculated_calories": calc_cal,
+            "calculated_protein": calc_pro,
+            "calculated_carbs": calc_carb,
+            "calculated_fat": calc_fat,
         })
 
-        total_calories += meal_total_calories
-        total_protein += meal_total_protein
-        total_carbs += meal_total_carbs
-        total_fat += meal_total_fat
+        total_calories += calc_cal
+        total_protein += calc_pro
+        total_carbs += calc_carb
+        total_fat += calc_fat
+
+    return {
+        "id": meal.id,
+        "name": meal.name,
+        "order_index": meal.order_index,
+        "items": items_data,
+        "total_calories": round(total_calories, 2),
+        "total_protein": round(total_protein, 2),
+        "total_carbs": round(total_carbs, 2),
+        "total_fat": round(total_fat, 2),
+    }
+
+
+def _build_meals_data(meals: list) -> tuple[list[dict], float, float, float, float]:
+    """
+    Build meals data with calculated macros from a list of Meal ORM objects.
+
+    Returns:
+        Tuple of (meals_data, total_cal, total_pro, total_carb, total_fat)
+    """
+    meals_data = [build_meal_data(meal) for meal in meals]
 
     return (
         meals_data,
-        round(total_calories, 2),
-        round(total_protein, 2),
-        round(total_carbs, 2),
-        round(total_fat, 2),
+        round(sum(meal["total_calories"] for meal in meals_data), 2),
+        round(sum(meal["total_protein"] for meal in meals_data), 2),
+        round(sum(meal["total_carbs"] for meal in meals_data), 2),
+        round(sum(meal["total_fat"] for meal in meals_data), 2),
     )
 
 
-def _build_variation_data(variation) -> dict:
+def build_variation_data(variation) -> dict:
     """
     Build variation data with calculated macros from a DietVariation ORM object.
     Used by both get_current_diet_full and the rename_variation endpoint.
@@ -138,23 +233,7 @@ async def get_current_diet_full(
         ValueError: If no active diet plan is found
     """
     # Fetch the active plan with all related data eager-loaded.
-    stmt = (
-        select(DietPlan)
-        .where(DietPlan.user_id == user_id)
-        .where(DietPlan.is_active == True)
-        .options(
-            # Load variations with their meals and items
-            selectinload(DietPlan.variations)
-            .selectinload(DietVariation.meals)
-            .selectinload(Meal.items)
-            .selectinload(MealItem.food_item),
-            # Also load direct meals (for backward compat with plans without variations)
-            selectinload(DietPlan.meals)
-            .selectinload(Meal.items)
-            .selectinload(MealItem.food_item),
-        )
-    )
-    result = await db.execute(stmt)
+    result = await db.execute(_ACTIVE_PLAN_FULL_STMT, {"user_id": user_id})
     plan = result.scalar_one_or_none()
 
     if not plan:
@@ -166,11 +245,10 @@ async def get_current_diet_full(
     # Build variations data
     variations_data = []
     for variation in sorted(plan.variations, key=lambda v: v.order_index):
-        var_data = _build_variation_data(variation)
+        var_data = build_variation_data(variation)
         variations_data.append(var_data)
 
     # For backward compatibility: use the first variation's meals as the top-level meals
-    # If there are no variations, use plan.meals directly (legacy data)
     if variations_data:
         first_variation = variations_data[0]
         top_level_meals = first_variation["meals"]
@@ -179,10 +257,9 @@ async def get_current_diet_full(
         grand_total_carbs = first_variation["total_carbs"]
         grand_total_fat = first_variation["total_fat"]
     else:
-        # Legacy path: plan has meals without variations
-        top_level_meals, grand_total_calories, grand_total_protein, grand_total_carbs, grand_total_fat = (
-            _build_meals_data(plan.meals)
-        )
+        # Every meal belongs to a variation, so a plan without one has no meals
+        top_level_meals = []
+        grand_total_calories = grand_total_protein = grand_total_carbs = grand_total_fat = 0.0
 
     # Build macro comparisons (target vs actual from first variation)
     def make_comparison(target: float, actual: float) -> dict:
@@ -213,3 +290,137 @@ async def get_current_diet_full(
         "carbs_comparison": make_comparison(plan.target_carbs, grand_total_carbs),
         "fat_comparison": make_comparison(plan.target_fat, grand_total_fat),
     }
+
+
+async def get_current_plan_totals(
+    db: AsyncSession,
+    user_id: str = "default_user",
+) -> dict:
+    """
+    Fetch the active plan's targets and its actual macro totals in one query.
+
+    The totals come from the `variation_macro_totals` view for the first
+    variation (lowest order_index), matching the top-level totals returned by
+    get_current_diet_full. A plan without variations has no meals, so its
+    totals are 0.
+
+    Returns:
+        dict with target_* and total_* keys for calories, protein, carbs, fat
+
+    Raises:
+        ValueError: If no active diet plan is found
+    """
+    row = (await db.execute(_PLAN_TOTALS_STMT, {"user_id": user_id})).one_or_none()
+
+    if not row:
+        raise ValueError(
+            f"No active diet plan found for user '{user_id}'. "
+            "Create a diet plan first using POST /diet/plans."
+        )
+
+    return {
+        "target_calories": row.target_calories,
+        "target_protein": row.target_protein,
+        "target_carbs": row.target_carbs,
+        "target_fat": row.target_fat,
+        "total_calories": round(float(row.total_calories or 0), 2),
+        "total_protein": round(float(row.total_protein or 0), 2),
+        "total_carbs": round(float(row.total_carbs or 0), 2),
+        "total_fat": round(float(row.total_fat or 0), 2),
+    }
+
+
+# ============================================================
+# /diet/current RESPONSE CACHE
+# ============================================================
+# Serialized GET /diet/current bodies per user: {user_id: (expires_at, body)}.
+# The cache lives in each worker process, so a write only invalidates the
+# worker that handled it; other workers may serve the previous plan until
+# their entry expires. Disabled when DIET_CACHE_TTL_SECONDS is 0.
+_current_diet_cache: dict[str, tuple[float, bytes]] = {}
+
+# Generated export files, same rules: {(user_id, kind): (expires_at, content)}.
+# Whole files are much larger than JSON bodies, so only the most recently
+# used EXPORT_CACHE_MAXSIZE entries are kept.
+EXPORT_CACHE_MAXSIZE = 32
+_export_cache: OrderedDict[tuple[str, str], tuple[float, bytes]] = OrderedDict()
+
+# Bumped by every invalidation. A reader takes it before loading the plan and
+# passes it back when storing, so a body built from data read before a write
+# is never cached after that write's invalidation.
+_cache_generation = 0
+
+
+def cache_generation() -> int:
+    """Current cache generation; read it before loading the data to cache."""
+    return _cache_generation
+
+
+def _get_fresh(cache: dict, key) -> bytes | None:
+    """Return the cached bytes under `key`, dropping the entry if expired."""
+    entry = cache.get(key)
+    if entry is None:
+        return None
+
+    expires_at, body = entry
+    if expires_at <= time.monotonic():
+        cache.pop(key, None)
+        return None
+    return body
+
+
+def _store(cache: dict, key, body: bytes, generation: int) -> bool:
+    """
+    Store `body` under `key` for DIET_CACHE_TTL_SECONDS.
+
+    Skipped when caching is disabled (TTL 0) or when the cache was
+    invalidated since `generation` was read. Returns whether it was stored.
+    """
+    ttl = get_settings().DIET_CACHE_TTL_SECONDS
+    if ttl <= 0 or generation != _cache_generation:
+        return False
+    cache[key] = (time.monotonic() + ttl, body)
+    return True
+
+
+def get_cached_current_diet(user_id: str) -> bytes | None:
+    """Return the cached /diet/current JSON body for `user_id`, if still fresh."""
+    return _get_fresh(_current_diet_cache, user_id)
+
+
+def cache_current_diet(user_id: str, body: bytes, generation: int) -> None:
+    """Store the /diet/current JSON body for `user_id` (see `_store`)."""
+    _store(_current_diet_cache, user_id, body, generation)
+
+
+def get_cached_export(user_id: str, kind: str) -> bytes | None:
+    """Return the cached export file (`kind` is "xlsx" or "pdf") for `user_id`, if still fresh."""
+    content = _get_fresh(_export_cache, (user_id, kind))
+    if content is not None:
+        _export_cache.move_to_end((user_id, kind))
+    return content
+
+
+def cache_export(user_id: str, kind: str, content: bytes, generation: int) -> None:
+    """
+    Store an export file for `user_id` (see `_store`), evicting the least
+    recently used files beyond EXPORT_CACHE_MAXSIZE.
+    """
+    key = (user_id, kind)
+    if _store(_export_cache, key, content, generation):
+        _export_cache.move_to_end(key)
+        while len(_export_cache) > EXPORT_CACHE_MAXSIZE:
+            _export_cache.popitem(last=False)
+
+
+def invalidate_current_diet() -> None:
+    """
+    Drop every cached /diet/current body and export file.
+
+    Most write endpoints only know a plan, meal or item ID, not its owner, so
+    the whole cache is cleared; it holds one entry per active user.
+    """
+    global _cache_generation
+    _cache_generation += 1
+    _current_diet_cache.clear()
+    _export_cache.clear()
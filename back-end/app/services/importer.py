@@ -9,7 +9,9 @@ IMPORTANT NOTES:
   - The CSV may have bad lines, special characters, and non-numeric values.
   - Non-numeric values like "NA", "Tr" (trace), "*", "" are treated as 0.0.
   - We use pandas for robust CSV parsing and data cleaning.
-  - Bulk insert is used for performance (one INSERT for all rows).
+  - Bulk insert is used for performance: on PostgreSQL/asyncpg the rows are
+    streamed with COPY over the session's own connection; other drivers fall
+    back to one multi-row INSERT.
 
 Column Mapping (CSV -> Model):
   " Nome"           -> FoodItem.name         (note: leading space in CSV header)
@@ -43,6 +45,9 @@ COLUMN_MAPPING = {
 # Values that should be treated as zero (non-numeric placeholders in the CSV)
 NON_NUMERIC_PLACEHOLDERS = {"NA", "Tr", "na", "tr", "*", "-", ".."}
 
+# Columns written by the bulk COPY (id and created_at use their DB defaults)
+COPY_COLUMNS = ["name", "calories_kcal", "protein_g", "carbs_g", "fat_g"]
+
 
 def clean_numeric_value(value) -> float:
     """
@@ -82,7 +87,7 @@ def clean_numeric_value(value) -> float:
         return max(result, 0.0)
     except (ValueError, TypeError):
         # If we still can't parse it, log and return 0.0
-        logger.warning(f"Could not parse nutritional value: '{value}' -> defaulting to 0.0")
+        logger.warning("Could not parse nutritional value: '%s' -> defaulting to 0.0", value)
         return 0.0
 
 
@@ -94,6 +99,27 @@ def clean_column_name(col: str) -> str:
     return col.strip()
 
 
+async def _bulk_insert_food_items(db: AsyncSession, df: pd.DataFrame) -> None:
+    """
+    Insert all rows of the cleaned DataFrame into food_items.
+
+    With asyncpg, the rows go through COPY on the raw driver connection that
+    backs the session, so they stay inside the session's transaction and are
+    committed (or rolled back) with it. Other drivers use executemany INSERT.
+    """
+    conn = await db.connection()
+
+    if conn.dialect.driver == "asyncpg":
+        raw_connection = await conn.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            FoodItem.__tablename__,
+            records=df[COPY_COLUMNS].itertuples(index=False, name=None),
+            columns=COPY_COLUMNS,
+        )
+    else:
+        await db.execute(insert(FoodItem), df[COPY_COLUMNS].to_dict(orient="records"))
+
+
 async def import_taco_csv(db: AsyncSession, file_content: bytes) -> dict:
     """
     Parse a TACO CSV file and bulk-insert the food items into the database.
@@ -134,11 +160,11 @@ async def import_taco_csv(db: AsyncSession, file_content: bytes) -> dict:
             dtype=str,
         )
 
-    logger.info(f"CSV loaded: {len(df)} rows, columns: {list(df.columns)}")
+    logger.info("CSV loaded: %s rows, columns: %s", len(df), list(df.columns))
 
     # Step 2: Clean column names (strip whitespace)
     df.columns = [clean_column_name(col) for col in df.columns]
-    logger.info(f"Cleaned column names: {list(df.columns)}")
+    logger.info("Cleaned column names: %s", list(df.columns))
 
     # Step 3: Verify that all required columns exist in the CSV
     required_csv_columns = list(COLUMN_MAPPING.keys())
@@ -170,21 +196,18 @@ async def import_taco_csv(db: AsyncSession, file_content: bytes) -> dict:
     for col in numeric_columns:
         df[col] = df[col].apply(clean_numeric_value)
 
-    logger.info(f"After cleaning: {len(df)} valid rows, {rows_skipped} skipped")
+    logger.info("After cleaning: %s valid rows, %s skipped", len(df), rows_skipped)
 
     # Step 6: Bulk insert into the database
-    # Convert DataFrame to a list of dicts for SQLAlchemy bulk insert
-    records = df.to_dict(orient="records")
+    rows_imported = len(df)
 
-    if records:
-        # Use SQLAlchemy's bulk insert for maximum performance
-        # This generates a single INSERT statement with all rows
-        await db.execute(insert(FoodItem), records)
+    if rows_imported:
+        await _bulk_insert_food_items(db, df)
         await db.commit()
-        logger.info(f"Successfully inserted {len(records)} food items")
+        logger.info("Successfully inserted %s food items", rows_imported)
 
     return {
         "total_rows_processed": total_rows,
-        "rows_imported": len(records),
+        "rows_imported": rows_imported,
         "rows_skipped": rows_skipped,
     }
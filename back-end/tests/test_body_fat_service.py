@@ -0,0 +1,93 @@
+"""
+Tests for the Body Fat Service — stored Pollock 7-fold fields
+===============================================================
+`calculated_body_fat_fields` fills BodyLog.calculated_* when a log is written;
+it must match `calculate_body_fat_from_skinfolds` and be empty for incomplete logs.
+The SQL versions of the formula (used for updates and the backfill) must give
+the same values as the Python one.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import Float, create_engine, event, literal, select
+
+from app.services.body_fat import (
+    SKINFOLD_FIELDS,
+    calculate_body_fat_from_skinfolds,
+    calculated_body_fat_fields,
+    has_all_skinfolds,
+    skinfold_body_density_sql,
+    skinfold_body_fat_sql,
+)
+
+
+def _log(*values):
+    """Build a log-like object with the 7 skinfold sites in SKINFOLD_FIELDS order."""
+    return SimpleNamespace(**dict(zip(SKINFOLD_FIELDS, values)))
+
+
+def test_fields_match_scalar_calculation():
+    log = _log(10.0, 12.0, 9.0, 14.0, 13.0, 20.0, 15.0)
+
+    fields = calculated_body_fat_fields(log)
+    expected = calculate_body_fat_from_skinfolds(10.0, 12.0, 9.0, 14.0, 13.0, 20.0, 15.0)
+
+    assert fields == {
+        "calculated_body_density": expected["body_density"],
+        "calculated_body_fat_percent": expected["body_fat_percent"],
+    }
+
+
+def test_fields_are_empty_for_incomplete_logs():
+    log = _log(10.0, 12.0, 9.0, 14.0, 13.0, 20.0, None)
+
+    assert not has_all_skinfolds(log)
+    assert calculated_body_fat_fields(log) == {
+        "calculated_body_density": None,
+        "calculated_body_fat_percent": None,
+    }
+
+
+@pytest.fixture(scope="module")
+def sqlite_conn():
+    """In-memory SQLite with the GREATEST/LEAST functions PostgreSQL provides."""
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def _register_functions(dbapi_conn, _record):
+        dbapi_conn.create_function("greatest", 2, max)
+        dbapi_conn.create_function("least", 2, min)
+
+    with engine.connect() as conn:
+        yield conn
+    engine.dispose()
+
+
+@pytest.mark.parametrize("skinfolds", [
+    (10.0, 12.0, 9.0, 14.0, 13.0, 20.0, 15.0),
+    (4.5, 6.2, 7.1, 9.9, 8.3, 11.0, 10.4),
+    (30.25, 28.1, 25.5, 35.0, 40.2, 45.75, 33.3),
+    (60.0, 70.0, 80.0, 90.0, 99.99, 120.0, 110.0),
+    (0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0),  # negative fat %, clamped to 0
+])
+def test_sql_formula_matches_python(sqlite_conn, skinfolds):
+    columns = [literal(value, Float) for value in skinfolds]
+
+    density, fat_percent = sqlite_conn.execute(
+        select(skinfold_body_density_sql(columns), skinfold_body_fat_sql(columns))
+    ).one()
+    expected = calculate_body_fat_from_skinfolds(*skinfolds)
+
+    assert density == expected["body_density"]
+    assert fat_percent == expected["body_fat_percent"]
+
+
+def test_sql_formula_is_null_for_incomplete_skinfolds(sqlite_conn):
+    columns = [literal(value, Float) for value in (10.0, 12.0, 9.0, 14.0, 13.0, 20.0, None)]
+
+    row = sqlite_conn.execute(
+        select(skinfold_body_density_sql(columns), skinfold_body_fat_sql(columns))
+    ).one()
+
+    assert tuple(row) == (None, None)
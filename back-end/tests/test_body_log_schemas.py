@@ -0,0 +1,50 @@
+"""
+Tests for the Body Log schemas — NUMERIC column bounds and required fields
+===========================================================================
+Measurements are stored as NUMERIC(5,2) and weight as NUMERIC(6,2), so any
+value PostgreSQL would round past 999.99 / 9999.99 must be rejected with a
+validation error (422) instead of overflowing on INSERT (500).
+
+`date` and `weight_kg` are NOT NULL columns: an update may leave them out,
+but an explicit null must fail validation instead of the UPDATE.
+"""
+
+import datetime
+
+import pytest
+from pydantic import ValidationError
+
+from app.schemas import BodyLogCreate, BodyLogUpdate
+
+
+def test_largest_storable_values_are_accepted():
+    log = BodyLogCreate(date=datetime.date(2026, 1, 1), weight_kg=9999.99, circ_waist=999.99)
+
+    assert log.weight_kg == 9999.99
+    assert log.circ_waist == 999.99
+
+
+@pytest.mark.parametrize("field, value", [
+    ("weight_kg", 9999.995),
+    ("circ_waist", 999.995),
+    ("skinfold_thigh", 1000),
+])
+def test_values_that_round_past_the_column_precision_are_rejected(field, value):
+    data = {"date": datetime.date(2026, 1, 1), "weight_kg": 80.0, field: value}
+
+    with pytest.raises(ValidationError):
+        BodyLogCreate(**data)
+    with pytest.raises(ValidationError):
+        BodyLogUpdate(**{field: value})
+
+
+@pytest.mark.parametrize("field", ["date", "weight_kg"])
+def test_update_rejects_null_for_required_columns(field):
+    with pytest.raises(ValidationError):
+        BodyLogUpdate(**{field: None})
+
+
+def test_update_may_omit_required_columns():
+    update = BodyLogUpdate(circ_waist=80.0)
+
+    assert update.model_dump(exclude_unset=True) == {"circ_waist": 80.0}
@@ -0,0 +1,72 @@
+"""
+Tests for the Body Logs Router — stored body fat on update
+===========================================================
+Runs against PostgreSQL through the `client` fixture (see conftest.py).
+
+The Pollock/Siri result is stored with each log. An update that touches any
+skinfold recomputes it inside the UPDATE (unchanged skinfolds keep their
+stored values), and must match what the Python service computes.
+"""
+
+from types import SimpleNamespace
+
+from app.services.body_fat import SKINFOLD_FIELDS, calculated_body_fat_fields
+
+SKINFOLDS = dict(zip(SKINFOLD_FIELDS, (10.0, 12.0, 8.0, 15.0, 14.0, 20.0, 12.0)))
+
+
+def _create_log(client, **fields) -> dict:
+    response = client.post("/body-logs/", json={"date": "2026-01-05", "weight_kg": 80.0, **fields})
+    assert response.status_code == 201
+    return response.json()
+
+
+def test_updating_a_skinfold_recomputes_the_body_fat(client):
+    log = _create_log(client, **SKINFOLDS)
+
+    response = client.put(f"/body-logs/{log['id']}", json={"skinfold_abdominal": 30.0})
+
+    assert response.status_code == 200
+    expected = calculated_body_fat_fields(
+        SimpleNamespace(**{**SKINFOLDS, "skinfold_abdominal": 30.0})
+    )
+    assert response.json()["calculated_body_fat_percent"] == expected["calculated_body_fat_percent"]
+    assert response.json()["calculated_body_density"] == expected["calculated_body_density"]
+    assert response.json()["calculated_body_fat_percent"] > log["calculated_body_fat_percent"]
+
+
+def test_completing_the_skinfolds_computes_the_body_fat(client):
+    log = _create_log(client, **{**SKINFOLDS, "skinfold_thigh": None})
+    assert log["calculated_body_fat_percent"] is None
+
+    response = client.put(f"/body-logs/{log['id']}", json={"skinfold_thigh": 12.0})
+
+    expected = calculated_body_fat_fields(SimpleNamespace(**SKINFOLDS))
+    assert response.json()["calculated_body_fat_percent"] == expected["calculated_body_fat_percent"]
+
+
+def test_clearing_a_skinfold_clears_the_body_fat(client):
+    log = _create_log(client, **SKINFOLDS)
+
+    response = client.put(f"/body-logs/{log['id']}", json={"skinfold_chest": None})
+
+    assert response.json()["calculated_body_density"] is None
+    assert response.json()["calculated_body_fat_percent"] is None
+
+
+def test_updating_other_fields_keeps_the_body_fat(client):
+    log = _create_log(client, **SKINFOLDS)
+
+    response = client.put(f"/body-logs/{log['id']}", json={"weight_kg": 81.0})
+
+    assert response.json()["weight_kg"] == 81.0
+    assert response.json()["calculated_body_fat_percent"] == log["calculated_body_fat_percent"]
+
+
+def test_moving_a_log_onto_an_existing_date_is_409(client):
+    _create_log(client)
+    other = client.post("/body-logs/", json={"date": "2026-01-06", "weight_kg": 80.0}).json()
+
+    response = client.put(f"/body-logs/{other['id']}", json={"date": "2026-01-05"})
+
+    assert response.status_code == 409
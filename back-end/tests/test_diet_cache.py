@@ -0,0 +1,56 @@
+"""
+Tests for the Diet Calculator response cache
+=============================================
+Export files are kept in a bounded LRU, and nothing read before an
+invalidation may be stored after it.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import diet_calculator
+from app.services.diet_calculator import (
+    EXPORT_CACHE_MAXSIZE,
+    cache_current_diet,
+    cache_export,
+    cache_generation,
+    get_cached_current_diet,
+    get_cached_export,
+    invalidate_current_diet,
+)
+
+
+@pytest.fixture(autouse=True)
+def enabled_cache(monkeypatch):
+    monkeypatch.setattr(
+        diet_calculator, "get_settings", lambda: SimpleNamespace(DIET_CACHE_TTL_SECONDS=60)
+    )
+    invalidate_current_diet()
+    yield
+    invalidate_current_diet()
+
+
+def test_export_cache_evicts_least_recently_used():
+    generation = cache_generation()
+    for n in range(EXPORT_CACHE_MAXSIZE):
+        cache_export(f"user{n}", "pdf", b"pdf", generation)
+
+    # Reading user0 makes user1 the least recently used entry
+    assert get_cached_export("user0", "pdf") == b"pdf"
+    cache_export("extra", "pdf", b"pdf", generation)
+
+    assert get_cached_export("user0", "pdf") == b"pdf"
+    assert get_cached_export("user1", "pdf") is None
+    assert get_cached_export("extra", "pdf") == b"pdf"
+
+
+def test_body_read_before_an_invalidation_is_not_cached():
+    generation = cache_generation()
+    invalidate_current_diet()  # a write commits while the body is being built
+
+    cache_current_diet("default_user", b"stale", generation)
+    cache_export("default_user", "xlsx", b"stale", generation)
+
+    assert get_cached_current_diet("default_user") is None
+    assert get_cached_export("default_user", "xlsx") is None
@@ -0,0 +1,163 @@
+"""
+Tests for the Diet Router — ownership checks and meal items
+=============================================================
+Runs against PostgreSQL through the `client` fixture (see conftest.py).
+
+Writes are guarded in the UPDATE/DELETE itself; when nothing matched, a
+missing row is a 404 and a row of another user's (or an inactive) plan a 403.
+
+Adding a food that is already in the meal adds to the existing item's
+quantity, the same rule the startup migration applies when it merges
+repeated foods.
+"""
+
+import pytest
+
+
+def _create_meal(client) -> tuple[int, int]:
+    """Create an active plan with one meal and one food; return (meal_id, food_id)."""
+    plan = client.post("/diet/plans", json={
+        "target_calories": 3000, "target_protein": 150, "target_carbs": 400, "target_fat": 80,
+    }).json()
+    meal = client.post(f"/diet/plans/{plan['id']}/meals", json={"name": "Almoço"}).json()
+    food = client.post("/foods/", json={
+        "name": "Arroz", "calories_kcal": 130, "protein_g": 2.5, "carbs_g": 28, "fat_g": 0.3,
+    }).json()
+    return meal["id"], food["id"]
+
+
+def _current_variation(client) -> dict:
+    return client.get("/diet/current").json()["variations"][0]
+
+
+# ── Ownership checks ────────────────────────────────────────────
+
+def test_rename_meal(client):
+    meal_id, _ = _create_meal(client)
+
+    response = client.patch(f"/diet/meals/{meal_id}", json={"name": "Jantar"})
+
+    assert response.status_code == 200
+    assert response.json()["name"] == "Jantar"
+    assert _current_variation(client)["meals"][0]["name"] == "Jantar"
+
+
+@pytest.mark.parametrize("method", ["patch", "delete"])
+def test_meal_writes_on_a_missing_meal_are_404(client, method):
+    _create_meal(client)
+
+    response = client.request(method, "/diet/meals/999", json={"name": "Jantar"})
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Meal with ID 999 not found."
+
+
+@pytest.mark.parametrize("method", ["patch", "delete"])
+def test_meal_writes_on_another_users_meal_are_403(client, method):
+    meal_id, _ = _create_meal(client)
+
+    response = client.request(
+        method, f"/diet/meals/{meal_id}", params={"user_id": "other_user"}, json={"name": "Jantar"}
+    )
+
+    assert response.status_code == 403
+    assert _current_variation(client)["meals"][0]["name"] == "Almoço"
+
+
+@pytest.mark.parametrize("method", ["patch", "delete"])
+def test_meal_writes_on_an_inactive_plan_are_403(client, method):
+    meal_id, _ = _create_meal(client)
+    # Creating a new plan deactivates the one holding the meal
+    _create_meal(client)
+
+    response = client.request(method, f"/diet/meals/{meal_id}", json={"name": "Jantar"})
+
+    assert response.status_code == 403
+
+
+def test_delete_meal(client):
+    meal_id, _ = _create_meal(client)
+
+    response = client.delete(f"/diet/meals/{meal_id}")
+
+    assert response.status_code == 200
+    assert _current_variation(client)["meals"] == []
+
+
+def test_rename_variation(client):
+    _create_meal(client)
+    variation_id = _current_variation(client)["id"]
+
+    response = client.patch(f"/diet/variations/{variation_id}", json={"name": "Dia de treino"})
+
+    assert response.status_code == 200
+    assert response.json()["name"] == "Dia de treino"
+    assert [meal["name"] for meal in response.json()["meals"]] == ["Almoço"]
+
+
+def test_rename_variation_errors(client):
+    _create_meal(client)
+    variation_id = _current_variation(client)["id"]
+
+    missing = client.patch("/diet/variations/999", json={"name": "Dia de treino"})
+    not_owned = client.patch(
+        f"/diet/variations/{variation_id}", params={"user_id": "other_user"},
+        json={"name": "Dia de treino"},
+    )
+
+    assert missing.status_code == 404
+    assert missing.json()["detail"] == "Variation with ID 999 not found."
+    assert not_owned.status_code == 403
+    assert _current_variation(client)["name"] != "Dia de treino"
+
+
+# ── Adding meal items ───────────────────────────────────────────
+
+def test_adding_a_new_food_creates_an_item(client):
+    meal_id, food_id = _create_meal(client)
+
+    response = client.post(
+        f"/diet/meals/{meal_id}/add_item", json={"food_item_id": food_id, "quantity_grams": 100}
+    )
+
+    assert response.status_code == 201
+    assert response.json()["quantity_grams"] == 100
+    assert response.json()["calculated_calories"] == 130
+
+
+def test_adding_a_food_already_in_the_meal_sums_the_quantity(client):
+    meal_id, food_id = _create_meal(client)
+    first = client.post(
+        f"/diet/meals/{meal_id}/add_item", json={"food_item_id": food_id, "quantity_grams": 100}
+    ).json()
+
+    response = client.post(
+        f"/diet/meals/{meal_id}/add_item", json={"food_item_id": food_id, "quantity_grams": 150}
+    )
+
+    assert response.status_code == 200
+    item = response.json()
+    assert item["id"] == first["id"]
+    assert item["quantity_grams"] == 250
+    assert item["calculated_calories"] == 325
+    assert item["calculated_carbs"] == 70
+
+    meals = client.get("/diet/current").json()["variations"][0]["meals"]
+    assert [len(meal["items"]) for meal in meals] == [1]
+    assert meals[0]["total_calories"] == 325
+
+
+def test_adding_to_a_missing_meal_or_food_is_404(client):
+    meal_id, food_id = _create_meal(client)
+
+    missing_meal = client.post(
+        "/diet/meals/999/add_item", json={"food_item_id": food_id, "quantity_grams": 100}
+    )
+    missing_food = client.post(
+        f"/diet/meals/{meal_id}/add_item", json={"food_item_id": 999, "quantity_grams": 100}
+    )
+
+    assert missing_meal.status_code == 404
+    assert missing_meal.json()["detail"] == "Meal with ID 999 not found."
+    assert missing_food.status_code == 404
+    assert missing_food.json()["detail"] == "Food item with ID 999 not found."
@@ -0,0 +1,59 @@
+"""
+Tests for the schema bootstrap — inline migrations
+===================================================
+Runs against PostgreSQL through the `client` fixture (see conftest.py),
+whose startup already bootstrapped the schema; each test puts the database
+back into an older shape and runs the bootstrap again.
+"""
+
+from sqlalchemy import text
+
+from app.core.database import get_engine
+from app.main import create_tables_and_migrate
+
+
+def _execute(client, *statements: str) -> list:
+    """Run SQL statements in one transaction; returns the last one's rows."""
+    async def run():
+        async with get_engine().begin() as conn:
+            for statement in statements:
+                result = await conn.execute(text(statement))
+            return result.all() if result.returns_rows else []
+
+    return client.portal.call(run)
+
+
+def test_bootstrap_is_idempotent(client):
+    client.portal.call(create_tables_and_migrate)
+    client.portal.call(create_tables_and_migrate)
+
+    assert client.get("/diet/current").status_code == 404
+
+
+def test_repeated_foods_are_merged_before_the_unique_constraint(client):
+    plan = client.post("/diet/plans", json={
+        "target_calories": 3000, "target_protein": 150, "target_carbs": 400, "target_fat": 80,
+    }).json()
+    meal = client.post(f"/diet/plans/{plan['id']}/meals", json={"name": "Almoço"}).json()
+    food = client.post("/foods/", json={
+        "name": "Arroz", "calories_kcal": 130, "protein_g": 2.5, "carbs_g": 28, "fat_g": 0.3,
+    }).json()
+    client.post(
+        f"/diet/meals/{meal['id']}/add_item", json={"food_item_id": food["id"], "quantity_grams": 100}
+    )
+    # The table as it was before uq_meal_items_meal_food, with a repeated food
+    _execute(
+        client,
+        "ALTER TABLE meal_items DROP CONSTRAINT uq_meal_items_meal_food",
+        "INSERT INTO meal_items (meal_id, food_item_id, quantity_grams, calculated_calories,"
+        " calculated_protein, calculated_carbs, calculated_fat)"
+        " SELECT meal_id, food_item_id, 50, 65, 1.25, 14, 0.15 FROM meal_items",
+    )
+
+    client.portal.call(create_tables_and_migrate)
+
+    rows = _execute(client, "SELECT quantity_grams, calculated_calories FROM meal_items")
+    assert rows == [(150, 195)]
+    assert _execute(
+        client, "SELECT 1 FROM pg_constraint WHERE conname = 'uq_meal_items_meal_food'"
+    ) == [(1,)]